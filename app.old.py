@@ -3,7 +3,7 @@ import os
 import tempfile
 import streamlit as st
 import datetime
-from PyPDF2 import PdfReader
+import extraction
 from docx import Document
 from dotenv import load_dotenv
 import zipfile
@@ -56,10 +56,8 @@ if uploaded_file:
         tmp_path = tmp_file.name
 
     def extract_text_by_headings(pdf_path):
-        reader = PdfReader(pdf_path)
-        full_text = ""
-        for page in reader.pages:
-            full_text += page.extract_text() + "\n"
+        with open(pdf_path, "rb") as f:
+            full_text = "".join(page + "\n" for page in extraction.extract_pdf_pages(f.read()))
 
         import re
         headings = re.findall(r"(?m)^[A-Z][A-Z \-\d]{3,}$", full_text)
@@ -1,13 +1,14 @@
 import streamlit as st
-import os
-import tempfile
 import openai
+import tts
+import course
+import jobs
+import artifacts
+import sections
+import section_store
+import ui
 import datetime
-from docx import Document
-import zipfile
 import io
-import re
-from io import BytesIO
 
 openai.api_key = st.secrets["OPENAI_API_KEY"]
 
@@ -16,153 +17,124 @@ st.title("📘 AI Training Content App")
 
 uploaded_file = st.file_uploader("Upload a Markdown-style DOCX from the search app", type=["docx"])
 
+job_queue = jobs.default_queue()
+job_queue.register("class", course.class_job)
+
+ui.sidebar_panels(job_queue)
+mode = st.sidebar.selectbox(
+    "Prompt layout",
+    course.MODES,
+    format_func={
+        course.SHARED: "Shared content prefix",
+        course.SEPARATE: "Separate prompts",
+        course.COMBINED: "Single combined request",
+    }.get,
+    help="Shared: the content comes first in every prompt so the provider's prompt cache bills it once. "
+    "Combined: one structured request for all three artifacts (not streamed).",
+)
+
 selected_sections = []
 all_sections = []
 
-# Extract sections from Markdown-style headings in .docx (### style)
-def extract_sections_markdown_headings(doc_path):
-    doc = Document(doc_path)
-    text_blocks = [p.text.strip() for p in doc.paragraphs if p.text.strip() != ""]
-    sections = []
-    current_heading = None
-    current_content = []
-
-    for line in text_blocks:
-        if line.startswith("### "):
-            if current_heading and current_content:
-                sections.append((current_heading, "\n".join(current_content).strip()))
-            current_heading = line.replace("### ", "").strip()
-            current_content = []
-        elif current_heading:
-            current_content.append(line)
-
-    if current_heading and current_content:
-        sections.append((current_heading, "\n".join(current_content).strip()))
-
-    return sections
-
 if uploaded_file:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_file:
-        tmp_file.write(uploaded_file.read())
-        tmp_path = tmp_file.name
-
-    extracted = extract_sections_markdown_headings(tmp_path)
+    extracted = list(sections.iter_sections(uploaded_file.getvalue()))
 
     if extracted:
         all_sections = [f"{i+1}. {title}" for i, (title, _) in enumerate(extracted)]
         selected_sections = st.multiselect("Choose section(s) to create class from", all_sections)
 
-        run_type = st.session_state.get("run_type", "")
+        # Material is stored per selected content and run type (see course.class_job), so a
+        # selection whose joined content is unchanged reuses what was generated for it before
+        selected_indices = [int(s.split(".")[0]) - 1 for s in selected_sections]
+        selected_content = "\n\n".join(extracted[i][1] for i in selected_indices)
+        class_store = section_store.default_store()
+        reusable = [
+            run_type for run_type in ("QuickByte", "FastTrack")
+            if selected_indices and class_store.has(section_store.section_hash(selected_content, run_type))
+        ]
+        force = st.checkbox(
+            "Regenerate", help="Generate fresh material instead of reusing stored or cached answers for this selection"
+        )
+        if reusable and not force:
+            st.caption(f"The {' and '.join(reusable)} for this selection was generated before and will be reused.")
+
+        # Generation runs as a background job (see ui.job_status)
+        run_type = None
         col1, col2 = st.columns(2)
         if col1.button("Create QuickByte"):
-            st.session_state.run_type = "QuickByte"
+            run_type = "QuickByte"
         if col2.button("Create FastTrack", disabled=len(selected_sections) < 1):
-            st.session_state.run_type = "FastTrack"
+            run_type = "FastTrack"
 
-        if "run_type" in st.session_state and st.session_state.run_type:
-            selected_indices = [int(s.split(".")[0]) - 1 for s in selected_sections]
-            selected_content = "\n\n".join(extracted[i][1] for i in selected_indices)
+        if run_type:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            st.query_params["job"] = job_queue.submit("class", {
+                "content": selected_content,
+                "run_type": run_type,
+                "heading": ", ".join(extracted[i][0] for i in selected_indices),
+                "suffix": f"_{timestamp}",
+                "mode": mode,
+                "force": force,
+            })
+
+
+# Finished class job: the artifact tabs with downloads and narration audio
+def show_class(job_id, result):
+    # Downloads are fetched from the job once and kept in this session's artifact store
+    store = artifacts.session_store(st.session_state)
+    if st.session_state.get("loaded_job") != job_id:
+        for name, artifact in job_queue.artifacts(job_id).items():
+            store.put(name, artifact)
+        st.session_state.loaded_job = job_id
+    if result["reused"]:
+        st.info("Section content is unchanged; reusing the previously generated material.")
+    for name, error in result["errors"].items():
+        st.error(f"{name} generation failed: {error}")
 
-            with st.spinner("Generating content..."):
-                outline_response = openai.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[
-                        {"role": "system", "content": "You are an expert instructional designer."},
-                        {"role": "user", "content": f"Create an outline with learning objectives for a {'15-minute QuickByte' if st.session_state.run_type == 'QuickByte' else '30-minute FastTrack'} instructor-led class based on this:\n{selected_content}"},
-                    ]
-                )
-
-                script_response = openai.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a professional e-learning narrator."},
-                        {"role": "user", "content": f"Write a friendly but professional narration script for a video based on this content:\n{selected_content}"},
-                    ]
-                )
-
-                tips_prompt = (
-                    "Generate exactly 5 email tips based on the following training content."
-                    " Each tip should include the following structure:\n"
-                    "Tip X: [Title]\nBenefit: [Why it's useful]\nSteps:\n1. ...\n2. ...\n3. ..."
-                    " Clearly separate each tip using 'Tip X:' and keep the structure consistent."
-                )
-
-                tips_response = openai.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[
-                        {"role": "system", "content": "You are an instructional content expert."},
-                        {"role": "user", "content": f"{tips_prompt}\n\nCONTENT:\n{selected_content}"}
-                    ]
-                )
-
-                outline_text = outline_response.choices[0].message.content
-                script_text = script_response.choices[0].message.content
-                tips_text = tips_response.choices[0].message.content
-
-                def create_word_doc(text, filename):
-                    doc = Document()
-                    doc.add_paragraph(text)
-                    temp_path = os.path.join(tempfile.gettempdir(), filename)
-                    doc.save(temp_path)
-                    return temp_path
-
-                def create_text_file(text, filename):
-                    temp_path = os.path.join(tempfile.gettempdir(), filename)
-                    with open(temp_path, "w", encoding="utf-8") as f:
-                        f.write(text)
-                    return temp_path
-
-                outline_file = create_word_doc(outline_text, f"class_outline_{timestamp}.docx")
-                script_file = create_text_file(script_text, f"narration_script_{timestamp}.txt")
-
-                tip_pattern = r"Tip\s+(\d+):\s*(.*?)\s*(?=Tip\s+\d+:|\Z)"
-                tip_blocks = re.findall(tip_pattern, tips_text, re.DOTALL)
-                tips = []
-                for num, body in tip_blocks:
-                    body_clean = re.sub(r"^Tip\s+\d+:", "", body.strip()).strip("* ")
-                    tip_text = f"Tip {num}:\n{body_clean.lstrip(f'Tip {num}:').strip()}"
-                    if body_clean:
-                        tips.append(tip_text)
-                tips = tips[:5]
-
-                tip_files = []
-                for i, tip in enumerate(tips):
-                    tip_filename = f"email_tip_{i+1}_{timestamp}.docx"
-                    tip_path = create_word_doc(tip, tip_filename)
-                    tip_files.append((f"Email Tip {i+1}", tip, tip_path))
-
-                tip_zip = io.BytesIO()
-                with zipfile.ZipFile(tip_zip, "w") as zipf:
-                    for _, _, path in tip_files:
-                        zipf.write(path, os.path.basename(path))
-                tip_zip.seek(0)
-
-                st.session_state.generated = True
-                st.session_state.timestamp = timestamp
-                st.session_state.tabs = {
-                    "Outline": (outline_text, outline_file),
-                    "Narration": (script_text, script_file),
-                    "Email Tips": (tips, tip_zip)
-                }
-
-if st.session_state.get("generated"):
     tabs = st.tabs(["Outline", "Narration", "Email Tips"])
 
     with tabs[0]:
-        tab_content, tab_file = st.session_state.tabs["Outline"]
-        with open(tab_file, "rb") as f:
-            st.download_button(label="Download Class Outline", data=f, file_name=os.path.basename(tab_file))
+        tab_content = result["outline"]
+        outline = store.get("Outline")
+        if outline:
+            st.download_button(label="Download Class Outline", data=outline.data, file_name=outline.filename, mime=outline.mime)
         st.markdown(tab_content)
 
     with tabs[1]:
-        tab_content, tab_file = st.session_state.tabs["Narration"]
-        with open(tab_file, "rb") as f:
-            st.download_button(label="Download Narration Script", data=f, file_name=os.path.basename(tab_file))
+        tab_content = result["narration"]
+        script = store.get("Narration")
+        if script:
+            st.download_button(label="Download Narration Script", data=script.data, file_name=script.filename, mime=script.mime)
+
+        audio_name = f"narration_audio{result['suffix']}.mp3"
+        if st.button("Generate Narration Audio"):
+            progress = st.progress(0.0, text="Synthesizing narration audio...")
+            try:
+                audio = io.BytesIO()
+                tts.synthesize_script(
+                    tab_content,
+                    audio,
+                    progress=lambda done, total: progress.progress(done / total, text=f"Synthesized {done}/{total} segments"),
+                )
+                store.put("Narration Audio", artifacts.Artifact(audio_name, audio.getvalue(), artifacts.MP3_MIME))
+            except Exception as e:
+                st.error(f"TTS failed: {e}")
+            progress.empty()
+        audio = store.get("Narration Audio")
+        if audio and audio.filename == audio_name:
+            st.audio(audio.data, format="audio/mp3")
+            st.download_button("Download Narration Audio (mp3)", data=audio.data, file_name=audio.filename, mime=audio.mime)
         st.markdown(tab_content)
 
     with tabs[2]:
-        tip_texts, tip_zip = st.session_state.tabs["Email Tips"]
-        st.download_button("Download All Email Tips", data=tip_zip, file_name=f"email_tips_{st.session_state.timestamp}.zip")
+        tip_texts = result["tips"]
+        tip_zip = store.get("Email Tips")
+        if tip_zip:
+            st.download_button("Download All Email Tips", data=tip_zip.data, file_name=tip_zip.filename, mime=tip_zip.mime)
         for i, tip in enumerate(tip_texts):
             st.markdown(f"**Tip {i+1}:** {tip}")
+
+
+ui.job_status(job_queue, show_class, ui.class_partial_tabs)
+
+ui.timings_panel()
@@ -0,0 +1,87 @@
+import io
+import zipfile
+from collections import OrderedDict, namedtuple
+from docx import Document
+import tracing
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TXT_MIME = "text/plain"
+ZIP_MIME = "application/zip"
+MP3_MIME = "audio/mpeg"
+
+# Per-session cap on downloadable artifacts held in memory
+MAX_SESSION_BYTES = 64 * 1024 * 1024
+
+Artifact = namedtuple("Artifact", "filename data mime")
+
+
+def docx_bytes(text):
+    with tracing.span("docx_bytes", chars=len(text)) as record:
+        doc = Document()
+        doc.add_paragraph(text)
+        output = io.BytesIO()
+        doc.save(output)
+        record["bytes"] = output.tell()
+        return output.getvalue()
+
+
+def docx_artifact(text, filename):
+    return Artifact(filename, docx_bytes(text), DOCX_MIME)
+
+
+def text_artifact(text, filename):
+    return Artifact(filename, text.encode("utf-8"), TXT_MIME)
+
+
+def zip_artifact(members, filename):
+    with tracing.span("zip_artifact", members=len(members)) as record:
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for member in members:
+                zipf.writestr(member.filename, member.data)
+        record["bytes"] = output.tell()
+        return Artifact(filename, output.getvalue(), ZIP_MIME)
+
+
+# Outline, narration script and zipped email tips for one class, keyed by tab name
+def class_artifacts(outline_text, script_text, tips, suffix=""):
+    return {
+        "Outline": docx_artifact(outline_text, f"class_outline{suffix}.docx"),
+        "Narration": text_artifact(script_text, f"narration_script{suffix}.txt"),
+        "Email Tips": zip_artifact(
+            [docx_artifact(tip, f"email_tip_{i+1}{suffix}.docx") for i, tip in enumerate(tips)],
+            f"email_tips{suffix}.zip",
+        ),
+    }
+
+
+# Bounded in-memory artifact cache; the least recently used artifacts are dropped once
+# the total size passes max_bytes
+class ArtifactStore:
+    def __init__(self, max_bytes=MAX_SESSION_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+
+    def put(self, key, artifact):
+        if key in self._items:
+            self._size -= len(self._items.pop(key).data)
+        self._items[key] = artifact
+        self._size += len(artifact.data)
+        while self._size > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted.data)
+        return artifact
+
+    def get(self, key):
+        artifact = self._items.get(key)
+        if artifact is not None:
+            self._items.move_to_end(key)
+        return artifact
+
+
+# The artifact store of the current Streamlit session
+def session_store(session_state):
+    if "artifact_store" not in session_state:
+        session_state["artifact_store"] = ArtifactStore()
+    return session_state["artifact_store"]
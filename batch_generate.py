@@ -0,0 +1,282 @@
+# batch_generate.py
+# Headless bulk generation of QuickByte/FastTrack material from a directory of ###-headed DOCX files.
+#
+#   python batch_generate.py INPUT_DIR OUTPUT_DIR [--run-type FastTrack] [--workers 4]
+#
+# Every section becomes OUTPUT_DIR/<document>/<NNN_section>/ with the outline, narration script
+# and email tips. Finished sections are recorded in OUTPUT_DIR/manifest.json, so rerunning the
+# same command after a crash only generates what is missing. Generated material is also kept by
+# section content hash in OUTPUT_DIR/sections.sqlite3: after a vendor revises a manual, rerunning
+# regenerates only the sections whose content changed and rewrites the rest from the store.
+#
+# --force regenerates every section, ignoring the manifest, the section store and the response
+# cache; the new material replaces what was stored for each section.
+# --batch-api sends every prompt as one OpenAI Batch API job instead (cheaper, slower);
+# --fake-server runs either mode against fake_openai.py without network access.
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
+from pydantic import ValidationError
+import course
+import fake_openai
+import llm
+import openai_batch
+import rate_limit
+import section_store
+import sections
+import tracing
+
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+MANIFEST_NAME = "manifest.json"
+# Manifest entry holding the in-flight Batch API job; section ids never start with "_"
+BATCH_KEY = "_batch"
+ARTIFACTS = ("Outline", "Narration", "Email Tips")
+
+
+def slugify(text, max_length=60):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")
+    return slug[:max_length] or "section"
+
+
+# Checkpoint of finished sections, rewritten atomically after every completion
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    # Done and generated from the same section content as now
+    def is_done(self, job_id, content_hash):
+        entry = self.entries.get(job_id, {})
+        return entry.get("status") == "done" and entry.get("content_hash") == content_hash
+
+    def record(self, job_id, entry):
+        with self._lock:
+            self.entries[job_id] = entry
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+# (job id, document name, heading, content, content hash) for every section of every DOCX in input_dir
+def discover_jobs(input_dir, run_type):
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(".docx") or name.startswith("~$"):
+            continue
+        stem = os.path.splitext(name)[0]
+        for i, (heading, content) in enumerate(sections.iter_sections(os.path.join(input_dir, name))):
+            job_id = f"{slugify(stem)}/{i+1:03d}_{slugify(heading)}"
+            jobs.append((job_id, name, heading, content, section_store.section_hash(content, run_type)))
+    return jobs
+
+
+def write_record(output_dir, job_id, record):
+    return course.write_class_files(
+        os.path.join(output_dir, job_id), record["outline"], record["narration"], record["tips"]
+    )
+
+
+def generate_section(job, run_type, output_dir, store, mode=course.SHARED, use_cache=True):
+    job_id, _, heading, content, content_hash = job
+    record, errors = course.generate_class(content, run_type, mode, priority=rate_limit.BATCH, use_cache=use_cache)
+    if errors:
+        raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+    record = store.put(content_hash, heading, record["outline"], record["narration"], course.format_tips(record["tips"]))
+    return write_record(output_dir, job_id, record)
+
+
+def record_done(manifest, args, job, files, reused=False):
+    job_id, document, heading, _, content_hash = job
+    manifest.record(job_id, {
+        "status": "done",
+        "document": document,
+        "heading": heading,
+        "run_type": args.run_type,
+        "content_hash": content_hash,
+        "reused": reused,
+        "files": [os.path.relpath(path, args.output_dir) for path in files],
+    })
+
+
+# Synchronous mode: one chat call per artifact, sections spread over a worker pool
+def run_workers(args, manifest, store, pending, start):
+    completed = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(generate_section, job, args.run_type, args.output_dir, store, args.mode, not args.force): job
+            for job in pending
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            job_id, document, heading = job[:3]
+            try:
+                files = future.result()
+            except Exception as e:
+                failed += 1
+                manifest.record(job_id, {"status": "failed", "document": document, "heading": heading, "error": str(e)})
+                print(f"FAILED {job_id}: {e}", file=sys.stderr)
+                continue
+            completed += 1
+            record_done(manifest, args, job, files)
+            elapsed = time.perf_counter() - start
+            print(f"[{completed + failed}/{len(pending)}] {job_id} ({completed / elapsed * 60:.1f} sections/min)")
+    return completed, failed
+
+
+# Record for one section from the batch results, as generate_class() would have it before
+# fill_missing(); returns (record, tasks without an answer)
+def batch_record(results, job_id, mode):
+    tasks = (openai_batch.COMBINED_TASK,) if mode == course.COMBINED else ARTIFACTS
+    texts = {task: results.get(openai_batch.custom_id(job_id, task)) for task in tasks}
+    missing = [task for task, text in texts.items() if text is None]
+    if missing:
+        return None, missing
+    if mode != course.COMBINED:
+        return {"outline": texts["Outline"], "narration": texts["Narration"], "tips": course.tips_from_json(texts["Email Tips"]) or []}, []
+    try:
+        material = course.ClassMaterial.model_validate_json(texts[openai_batch.COMBINED_TASK])
+    except ValidationError:
+        return {}, []
+    record = material.model_dump()
+    record["tips"] = material.tips
+    return record, []
+
+
+# Batch API mode: all prompts go out as one batch job. The batch id is checkpointed in the
+# manifest so a crashed run resumes polling the same batch instead of resubmitting it.
+def run_batch_api(args, manifest, store, pending):
+    batch_entry = manifest.entries.get(BATCH_KEY)
+    if batch_entry and batch_entry.get("status") == "submitted":
+        batch_id = batch_entry["id"]
+        # Results are read in the prompt mode the batch was submitted with
+        args.mode = batch_entry["mode"]
+        pending = [job for job in pending if job[0] in set(batch_entry["jobs"])]
+        print(f"Resuming batch {batch_id} ({len(pending)} sections)")
+    else:
+        requests = openai_batch.build_requests(
+            [(job[0], job[3]) for job in pending], args.run_type, mode=args.mode
+        )
+        batch_id = openai_batch.submit(requests)
+        manifest.record(BATCH_KEY, {
+            "status": "submitted", "id": batch_id, "mode": args.mode, "jobs": [job[0] for job in pending],
+        })
+        print(f"Submitted batch {batch_id} with {len(requests)} requests")
+
+    batch = openai_batch.wait(
+        batch_id,
+        poll_interval=args.poll_interval,
+        progress=lambda b: print(f"Batch {b.id}: {b.status}"),
+    )
+    results, errors = openai_batch.fetch_results(batch)
+
+    completed = failed = 0
+    for job in pending:
+        job_id, document, heading, _, content_hash = job
+        record, missing = batch_record(results, job_id, args.mode)
+        if missing:
+            failed += 1
+            error = "; ".join(f"{a}: {errors.get(openai_batch.custom_id(job_id, a), batch.status)}" for a in missing)
+            manifest.record(job_id, {"status": "failed", "document": document, "heading": heading, "error": error})
+            print(f"FAILED {job_id}: {error}", file=sys.stderr)
+            continue
+        # Malformed or short answers are re-asked synchronously, field by field
+        record, still_missing = course.fill_missing(
+            record, job[3], args.run_type, priority=rate_limit.BATCH, shared_prefix=args.mode != course.SEPARATE,
+        )
+        if still_missing:
+            failed += 1
+            error = "; ".join(f"{field}: {e}" for field, e in still_missing.items())
+            manifest.record(job_id, {"status": "failed", "document": document, "heading": heading, "error": error})
+            print(f"FAILED {job_id}: {error}", file=sys.stderr)
+            continue
+        record = store.put(content_hash, heading, record["outline"], record["narration"], course.format_tips(record["tips"]))
+        completed += 1
+        record_done(manifest, args, job, write_record(args.output_dir, job_id, record))
+
+    manifest.record(BATCH_KEY, {"status": batch.status, "id": batch_id, "mode": args.mode, "jobs": [job[0] for job in pending]})
+    return completed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate class material for every ### section in a directory of DOCX files")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--run-type", choices=["QuickByte", "FastTrack"], default="QuickByte")
+    parser.add_argument("--workers", type=int, default=4, help="sections generated at the same time")
+    parser.add_argument(
+        "--mode", choices=course.MODES, default=course.SHARED,
+        help="prompt layout: shared content prefix (cached), separate prompts, or one combined request per section",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="regenerate every section instead of reusing earlier or cached material"
+    )
+    parser.add_argument("--batch-api", action="store_true", help="submit everything as one OpenAI Batch API job")
+    parser.add_argument("--poll-interval", type=float, default=30, help="seconds between batch status checks")
+    parser.add_argument("--fake-server", action="store_true", help="run against a local fake OpenAI server (no network)")
+    args = parser.parse_args()
+
+    if args.fake_server:
+        _, _, base_url = fake_openai.start_server()
+        openai.base_url = base_url
+        openai.api_key = openai.api_key or "fake"
+        llm.CACHE_ENABLED = False
+        args.poll_interval = min(args.poll_interval, 0.1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(args.output_dir, MANIFEST_NAME))
+    store = section_store.SectionStore(cache_dir=args.output_dir)
+    jobs = discover_jobs(args.input_dir, args.run_type)
+
+    # Sections whose content was generated before (here or under another id) are rewritten
+    # from the store; only new or changed content goes to the API
+    pending, done, reused = [], 0, 0
+    for job in jobs:
+        if args.force:
+            pending.append(job)
+            continue
+        if manifest.is_done(job[0], job[4]):
+            done += 1
+            continue
+        record = store.get(job[4])
+        if record is None:
+            pending.append(job)
+            continue
+        record_done(manifest, args, job, write_record(args.output_dir, job[0], record), reused=True)
+        reused += 1
+
+    current_ids = {job[0] for job in jobs}
+    removed = [job_id for job_id in manifest.entries if not job_id.startswith("_") and job_id not in current_ids]
+    print(f"{len(jobs)} sections found: {done} unchanged, {reused} reused from earlier content, {len(pending)} to generate")
+    if removed:
+        print(f"{len(removed)} previously generated sections are no longer in the source documents")
+
+    start = time.perf_counter()
+    if args.batch_api and pending:
+        completed, failed = run_batch_api(args, manifest, store, pending)
+    else:
+        completed, failed = run_workers(args, manifest, store, pending, start)
+
+    elapsed = time.perf_counter() - start
+    rate = completed / elapsed * 60 if elapsed else 0.0
+    print(f"Done: {completed} generated, {failed} failed in {elapsed:.1f}s ({rate:.1f} sections/min)")
+    usage = tracing.summary().get("chat.completions.create", {})
+    if usage.get("prompt_tokens"):
+        print(f"Prompt tokens: {usage['prompt_tokens']} ({usage.get('cached_tokens', 0)} cached), "
+              f"completion tokens: {usage.get('completion_tokens', 0)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Compare PDF extraction backends on pages/sec and peak memory.
+#
+#   python benchmarks/bench_pdf_backends.py                # synthetic sample corpus
+#   python benchmarks/bench_pdf_backends.py --corpus DIR   # your own PDFs
+#
+# Each backend runs in a fresh subprocess so peak RSS is measured in isolation.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_utils import CORPUS_DIR, peak_rss_mb
+
+SAMPLE_CORPUS = CORPUS_DIR
+SAMPLE_SIZES = [10, 100, 300]
+WORDS = (
+    "configure account mailbox calendar share permission folder signature printer "
+    "network password reset license vendor module report dashboard workflow approve "
+    "invoice ticket escalate template export import schedule meeting device"
+).split()
+
+
+# Deterministic synthetic manuals (a few pages of wrapped prose each) built with PyMuPDF. Each
+# size has its own seed, so a sample's content does not depend on which others already exist.
+def build_sample_corpus(directory=SAMPLE_CORPUS, sizes=SAMPLE_SIZES):
+    import fitz
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for pages in sizes:
+        path = os.path.join(directory, f"sample_{pages}_pages.pdf")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        rng = random.Random(pages)
+        doc = fitz.open()
+        for number in range(pages):
+            page = doc.new_page()
+            text = f"SECTION {number + 1}\n\n" + "\n".join(
+                " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(45)
+            )
+            page.insert_textbox(fitz.Rect(50, 50, 560, 790), text, fontsize=9)
+        doc.save(path)
+        doc.close()
+    return paths
+
+
+def run_worker(backend, paths):
+    import extraction
+
+    start = time.perf_counter()
+    pages = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            pages += len(extraction.extract_pdf_pages(f.read(), backend=backend))
+    seconds = time.perf_counter() - start
+    print(json.dumps({"backend": backend, "pages": pages, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF extraction backends")
+    parser.add_argument("--corpus", help="directory of PDFs (default: generated sample corpus)")
+    parser.add_argument("--backends", default="pymupdf,pypdfium2,pdfplumber,pypdf2")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args, rest = parser.parse_known_args()
+
+    if args.worker:
+        run_worker(args.worker, rest)
+        return
+
+    if args.corpus:
+        paths = sorted(os.path.join(args.corpus, f) for f in os.listdir(args.corpus) if f.lower().endswith(".pdf"))
+    else:
+        paths = build_sample_corpus()
+
+    import extraction
+
+    print(f"{'backend':<12}{'pages':>8}{'seconds':>10}{'pages/sec':>12}{'peak RSS MB':>14}")
+    for backend in args.backends.split(","):
+        if extraction.pdf_backend(backend) != backend:
+            print(f"{backend:<12}{'not installed':>44}")
+            continue
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, *paths],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        rate = result["pages"] / result["seconds"] if result["seconds"] else 0
+        print(f"{backend:<12}{result['pages']:>8}{result['seconds']:>10.2f}{rate:>12.1f}{result['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
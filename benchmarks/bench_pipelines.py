@@ -0,0 +1,238 @@
+# End-to-end latency of the app pipelines against the local fake OpenAI server (no network, no spend).
+#
+#   python benchmarks/bench_pipelines.py
+#   python benchmarks/bench_pipelines.py --pipelines search,quickbyte --runs 10 --latency 0.8 --response-words 600
+#   python benchmarks/bench_pipelines.py --json results.jsonl    # append one JSON line per row for CI
+#
+# The pipelines are the headless equivalents of the Streamlit apps:
+#   search           search.py: open, extract, BM25 index, streamed answer, Word download
+#   quickbyte        app.py: ### sections, three streamed generations, tips, downloads (+ audio with --tts)
+#   searchtocontent  searchtocontent.py: open, extract, find topics, per-topic retrieval extraction, three generations, downloads
+#   qref             qrefApp.py: open, extract, find topics, per-topic retrieval extraction, QREF document
+#
+# Every (pipeline, corpus) pair runs in a fresh subprocess with its own fake server and empty
+# caches, so peak RSS and API calls are measured in isolation. Peak RSS is the main process;
+# extraction worker processes are not included.
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import peak_rss_mb
+
+PIPELINES = ["search", "quickbyte", "searchtocontent", "qref"]
+SAMPLE_PDF_PAGES = [10, 100, 300]
+SAMPLE_DOCX_PARAGRAPHS = [2_000, 20_000]
+QUERY = "How do I share a calendar and change folder permissions?"
+SELECTED_TOPICS = 3
+
+
+# documents.Document per path, extracted up front as the apps do on the first query
+def open_documents(paths):
+    import documents
+
+    opened = []
+    for path in paths:
+        with open(path, "rb") as f:
+            opened.append(documents.open_document(os.path.basename(path), f.read()))
+    documents.prefetch(opened)
+    return opened
+
+
+def run_search(paths, args):
+    import artifacts
+    import documents
+    import llm
+    import retrieval
+
+    index = documents.index_for(open_documents(paths))
+    excerpts = retrieval.format_chunks(index.search(QUERY, k=retrieval.TOP_K))
+    result = "".join(llm.chat_stream(
+        "You are a helpful assistant who extracts relevant content from documents. Cite the [filename, p. N] of each excerpt you use.",
+        f"Search the following document excerpts and respond to this prompt:\n\n{QUERY}\n\nEXCERPTS:\n{excerpts}",
+    ))
+    artifacts.docx_bytes(result)
+
+
+def run_quickbyte(paths, args):
+    import artifacts
+    import course
+    import sections
+    import tts
+
+    for path in paths:
+        with open(path, "rb") as f:
+            extracted = list(sections.iter_sections(f.read()))
+        content = "\n\n".join(text for _, text in extracted[:args.sections])
+        record, errors = course.generate_class(content, "QuickByte", args.mode, on_update=lambda name, text: None)
+        if errors:
+            raise RuntimeError(errors)
+        artifacts.class_artifacts(record["outline"], record["narration"], course.format_tips(record["tips"]))
+        if args.tts:
+            tts.synthesize_script(record["narration"], io.BytesIO())
+
+
+# Topics found for QUERY and the retrieval index they are extracted from
+def _selected_topics(paths):
+    import documents
+    import topics
+
+    opened = open_documents(paths)
+    found = topics.find_topics_in_documents(opened, QUERY)
+    return found[:SELECTED_TOPICS], documents.index_for(opened)
+
+
+def run_searchtocontent(paths, args):
+    import artifacts
+    import course
+    import topics
+
+    content = topics.extract_topics_from_index(*_selected_topics(paths))
+    record, errors = course.generate_class(content, "QuickByte", args.mode, on_update=lambda name, text: None)
+    if errors:
+        raise RuntimeError(errors)
+    artifacts.docx_artifact(record["outline"], "outline.docx")
+    for i, tip in enumerate(course.format_tips(record["tips"])):
+        artifacts.docx_artifact(tip, f"email_tip_{i + 1}.docx")
+
+
+def run_qref(paths, args):
+    import qref
+    import topics
+
+    selected, index = _selected_topics(paths)
+    qref.qref_artifact(QUERY, "\n\n".join(topics.extract_topic_answers(selected, index).values()))
+
+
+RUNNERS = {
+    "search": run_search,
+    "quickbyte": run_quickbyte,
+    "searchtocontent": run_searchtocontent,
+    "qref": run_qref,
+}
+
+
+def run_worker(args, pipeline, paths):
+    # Caches live in a throwaway directory; cache_store reads this at import time
+    os.environ["TRAINING_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_cache_")
+    # Without --rate-limits the client-side limiter is effectively off so only pipeline cost is measured
+    if not args.rate_limits:
+        os.environ.update(OPENAI_CHAT_RPM="1000000", OPENAI_CHAT_TPM="1000000000", OPENAI_TTS_RPM="1000000")
+    import openai
+    import documents
+    import extraction
+    import fake_openai
+    import llm
+    import tracing
+    import tts
+
+    _, fake, base_url = fake_openai.start_server(latency=args.latency, response_words=args.response_words)
+    openai.base_url = base_url
+    openai.api_key = "fake"
+    llm.CACHE_ENABLED = False
+
+    latencies = []
+    for _ in range(args.runs):
+        if not args.warm:
+            extraction.document_cache.clear()
+            documents.clear()
+            tts.segment_cache.clear()
+            fake.prefixes.clear()
+        start = time.perf_counter()
+        RUNNERS[pipeline](paths, args)
+        latencies.append(time.perf_counter() - start)
+
+    spans = tracing.summary()
+    print(json.dumps({
+        "latencies": latencies,
+        "peak_rss_mb": peak_rss_mb(),
+        "calls": fake.calls,
+        "prompt_tokens": spans.get("chat.completions.create", {}).get("prompt_tokens", 0),
+        "cached_tokens": spans.get("chat.completions.create", {}).get("cached_tokens", 0),
+        "completion_tokens": spans.get("chat.completions.create", {}).get("completion_tokens", 0),
+    }))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def corpora(args):
+    from bench_pdf_backends import build_sample_corpus
+    from bench_sections import build_sample_docx
+
+    pdfs = [(f"{pages} pages", [path]) for pages, path in zip(args.pdf_pages, build_sample_corpus(sizes=args.pdf_pages))]
+    docxs = [(f"{n} paragraphs", [build_sample_docx(n)]) for n in args.docx_paragraphs]
+    return {"search": pdfs, "searchtocontent": pdfs, "qref": pdfs, "quickbyte": docxs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app pipelines against a fake OpenAI server")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--runs", type=int, default=5, help="runs per pipeline and corpus")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds the fake server adds to every request")
+    parser.add_argument("--response-words", type=int, default=300, help="words in every fake completion")
+    parser.add_argument("--pdf-pages", default=",".join(map(str, SAMPLE_PDF_PAGES)))
+    parser.add_argument("--docx-paragraphs", default=",".join(map(str, SAMPLE_DOCX_PARAGRAPHS)))
+    parser.add_argument("--sections", type=int, default=1, help="### sections per QuickByte")
+    parser.add_argument("--mode", choices=["shared", "separate", "combined"], default="shared", help="course prompt layout")
+    parser.add_argument("--tts", action="store_true", help="also synthesize narration audio in quickbyte")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the configured OpenAI rate limits")
+    parser.add_argument("--warm", action="store_true", help="keep document, audio and simulated prompt caches between runs")
+    parser.add_argument("--json", help="append one JSON line per result row to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args, rest = parser.parse_known_args()
+    args.pdf_pages = [int(n) for n in args.pdf_pages.split(",") if n]
+    args.docx_paragraphs = [int(n) for n in args.docx_paragraphs.split(",") if n]
+
+    if args.worker:
+        run_worker(args, args.worker, rest)
+        return
+
+    passthrough = [
+        "--runs", str(args.runs), "--latency", str(args.latency), "--response-words", str(args.response_words),
+        "--sections", str(args.sections), *(["--tts"] if args.tts else []), "--mode", args.mode, *(["--warm"] if args.warm else []),
+        *(["--rate-limits"] if args.rate_limits else []),
+    ]
+    corpus = corpora(args)
+    print(f"{'pipeline':<16}{'corpus':<18}{'p50 s':>8}{'p95 s':>8}{'max s':>8}{'calls/run':>11}{'tokens/run':>12}{'cached/run':>12}{'peak RSS MB':>13}")
+    for pipeline in args.pipelines.split(","):
+        for label, paths in corpus[pipeline]:
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", pipeline, *passthrough, *paths],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            latencies = result["latencies"]
+            calls = sum(count for endpoint, count in result["calls"].items() if endpoint.endswith(("/chat/completions", "/audio/speech")))
+            tokens = result["prompt_tokens"] + result["completion_tokens"]
+            row = {
+                "pipeline": pipeline,
+                "corpus": label,
+                "runs": len(latencies),
+                "p50_s": round(percentile(latencies, 0.5), 3),
+                "p95_s": round(percentile(latencies, 0.95), 3),
+                "max_s": round(max(latencies), 3),
+                "calls_per_run": calls / len(latencies),
+                "tokens_per_run": tokens // len(latencies),
+                "cached_tokens_per_run": result["cached_tokens"] // len(latencies),
+                "peak_rss_mb": round(result["peak_rss_mb"], 1),
+                "calls": result["calls"],
+                "latency": args.latency,
+                "response_words": args.response_words,
+                "mode": args.mode,
+            }
+            print(f"{pipeline:<16}{label:<18}{row['p50_s']:>8.2f}{row['p95_s']:>8.2f}{row['max_s']:>8.2f}"
+                  f"{row['calls_per_run']:>11.1f}{row['tokens_per_run']:>12}{row['cached_tokens_per_run']:>12}{row['peak_rss_mb']:>13.1f}")
+            if args.json:
+                with open(args.json, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()
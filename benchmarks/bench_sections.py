@@ -0,0 +1,78 @@
+# Compare the python-docx section parser with the streaming iterparse one.
+#
+#   python benchmarks/bench_sections.py                   # synthetic documents
+#   python benchmarks/bench_sections.py --docx FILE.docx  # a real export
+#
+# Each parser runs in a fresh subprocess so peak RSS is measured in isolation. The streaming
+# parser runs with heading_styles=False so both split at the same "### " headings; it still
+# keeps table text, which python-docx's paragraph list skips.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_utils import CORPUS_DIR, peak_rss_mb
+
+SAMPLE_DIR = CORPUS_DIR
+# Roughly 40 paragraphs per page
+SAMPLE_PARAGRAPHS = [2_000, 20_000, 60_000]
+WORDS = "open select click review confirm save share settings account feature menu report folder".split()
+
+
+def build_sample_docx(paragraphs, directory=SAMPLE_DIR):
+    from docx import Document
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"sections_{paragraphs}_paragraphs.docx")
+    if os.path.exists(path):
+        return path
+    rng = random.Random(42)
+    doc = Document()
+    for i in range(paragraphs):
+        if i % 25 == 0:
+            doc.add_paragraph(f"### Section {i // 25 + 1}")
+        else:
+            doc.add_paragraph(" ".join(rng.choice(WORDS) for _ in range(30)))
+    doc.save(path)
+    return path
+
+
+def run_worker(parser_name, path):
+    import sections
+
+    start = time.perf_counter()
+    if parser_name == "python-docx":
+        count = len(sections.extract_sections_markdown_headings(path))
+    else:
+        count = sum(1 for _ in sections.iter_sections(path, heading_styles=False))
+    seconds = time.perf_counter() - start
+    print(json.dumps({"sections": count, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DOCX section parsers")
+    parser.add_argument("--docx", action="append", help="DOCX file(s) to parse (default: synthetic documents)")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    paths = args.docx or [build_sample_docx(n) for n in SAMPLE_PARAGRAPHS]
+    print(f"{'document':<36}{'parser':<14}{'sections':>10}{'seconds':>10}{'peak RSS MB':>14}")
+    for path in paths:
+        for parser_name in ("python-docx", "iterparse"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", parser_name, path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{os.path.basename(path):<36}{parser_name:<14}{result['sections']:>10}{result['seconds']:>10.2f}{result['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
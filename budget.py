@@ -0,0 +1,70 @@
+import re
+import llm
+
+# Token counts come from tiktoken (pinned in requirements.txt); in an environment without it,
+# or when its encoding file cannot be downloaded, they are estimated at ~4 characters per token
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Largest prompt we send in one request. Well under the model's context window: beyond this,
+# latency and cost grow faster than answer quality, so map-reduce is used instead.
+MAX_PROMPT_TOKENS = 120_000
+# Size of each corpus piece in the map step
+MAP_CHUNK_TOKENS = 40_000
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+
+# tiktoken encoding for model, or None (remembered for the process) when it cannot be loaded
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text, model=llm.MODEL):
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def fits(text, max_tokens=MAX_PROMPT_TOKENS, model=llm.MODEL):
+    return count_tokens(text, model) <= max_tokens
+
+
+# Split text into pieces of at most max_tokens, breaking at paragraphs, then at words
+def split_to_budget(text, max_tokens=MAP_CHUNK_TOKENS, model=llm.MODEL):
+    pieces = []
+    current, current_tokens = [], 0
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph, model)
+        if tokens > max_tokens:
+            words = paragraph.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            parts = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            parts = [paragraph]
+        for part in parts:
+            part_tokens = count_tokens(part, model) if len(parts) > 1 else tokens
+            if current and current_tokens + part_tokens > max_tokens:
+                pieces.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
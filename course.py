@@ -0,0 +1,286 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel, ConfigDict, ValidationError
+import artifacts
+import llm
+import rate_limit
+import section_store
+import tracing
+
+TIP_COUNT = 5
+TIPS_PROMPT = (
+    "Generate exactly 5 email tips based on the training content."
+    " Each tip has a short title, the benefit (why it's useful) and 3-5 step-by-step instructions."
+)
+
+
+# Structured outputs (see llm.chat_structured); extra="forbid" keeps the schemas strict-mode valid
+class EmailTip(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    title: str
+    benefit: str
+    steps: list[str]
+
+
+class EmailTips(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    tips: list[EmailTip]
+
+
+class ClassMaterial(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    outline: str
+    narration: str
+    tips: list[EmailTip]
+
+
+# Prompt layouts for generate_class(): shared puts the source content first in a prefix that is
+# identical for every artifact prompt, so the provider's prompt cache serves it after the first
+# request; separate sends each artifact its own system prompt with the content last; combined
+# asks for all three artifacts in one structured request.
+SHARED = "shared"
+SEPARATE = "separate"
+COMBINED = "combined"
+MODES = (SHARED, SEPARATE, COMBINED)
+SHARED_SYSTEM = "You are an expert instructional designer, e-learning narrator and trainer."
+
+# Response format per task name for tasks that are answered as JSON
+TASK_FORMATS = {"Email Tips": EmailTips}
+# Record field for each task name
+FIELDS = {"Outline": "outline", "Narration": "narration", "Email Tips": "tips"}
+
+
+def _length(run_type):
+    return "15-minute QuickByte" if run_type == "QuickByte" else "30-minute FastTrack"
+
+
+# Per-artifact instructions for the shared-prefix layout
+def artifact_instructions(run_type):
+    return {
+        "Outline": f"Create an outline with learning objectives for a {_length(run_type)} instructor-led class based on the source content.",
+        "Narration": "Write a friendly but professional narration script for a video based on the source content.",
+        "Email Tips": TIPS_PROMPT,
+    }
+
+
+# Shared system prompt and source content followed by each artifact's instruction, so only
+# the short instruction differs between the prompts. instructions: {artifact name: instruction}
+def shared_prefix_tasks(content, instructions):
+    prefix = f"SOURCE CONTENT:\n{content}\n\nTASK:\n"
+    return {name: (SHARED_SYSTEM, prefix + instruction) for name, instruction in instructions.items()}
+
+
+# Prompts for one QuickByte/FastTrack class, keyed by artifact name for llm.run_generations()
+def generation_tasks(content, run_type, shared_prefix=False):
+    if shared_prefix:
+        return shared_prefix_tasks(content, artifact_instructions(run_type))
+    return {
+        "Outline": (
+            "You are an expert instructional designer.",
+            f"Create an outline with learning objectives for a {_length(run_type)} instructor-led class based on this:\n{content}",
+        ),
+        "Narration": (
+            "You are a professional e-learning narrator.",
+            f"Write a friendly but professional narration script for a video based on this content:\n{content}",
+        ),
+        "Email Tips": (
+            "You are an instructional content expert.",
+            f"{TIPS_PROMPT}\n\nCONTENT:\n{content}",
+        ),
+    }
+
+
+# All three artifacts in one structured request (the content is sent once instead of three
+# times). Laid out like the shared-prefix prompts so re-asks for missing fields hit the cache.
+def combined_task(content, run_type):
+    instruction = (
+        f"Create the material for a {_length(run_type)} class based on the source content:\n"
+        "- outline: an outline with learning objectives for the instructor-led class\n"
+        "- narration: a friendly but professional narration script for a video\n"
+        f"- tips: {TIPS_PROMPT}"
+    )
+    return shared_prefix_tasks(content, {"Combined": instruction})["Combined"]
+
+
+def format_tip(number, tip):
+    steps = "\n".join(f"{i}. {step}" for i, step in enumerate(tip.steps, start=1))
+    return f"Tip {number}: {tip.title}\nBenefit: {tip.benefit}\nSteps:\n{steps}"
+
+
+def format_tips(tips):
+    return [format_tip(i, tip) for i, tip in enumerate(tips[:TIP_COUNT], start=1)]
+
+
+# Tip objects from a tips answer: validated JSON, or None when the answer is malformed (or
+# not JSON at all), in which case fill_missing() asks for the tips again
+def tips_from_json(text):
+    try:
+        return EmailTips.model_validate_json(text or "").tips
+    except ValidationError:
+        return None
+
+
+def _missing_fields(record):
+    missing = [name for name in ("outline", "narration") if not (record.get(name) or "").strip()]
+    if len(record.get("tips") or []) < TIP_COUNT:
+        missing.append("tips")
+    return missing
+
+
+# Ask again only for the fields that came back empty, malformed or short of tips, instead of
+# regenerating the whole class. Returns the completed record and {field: error} for fields
+# that are still missing.
+def fill_missing(record, content, run_type, priority=rate_limit.INTERACTIVE, skip=(), shared_prefix=True):
+    missing = [name for name in _missing_fields(record) if name not in skip]
+    if not missing:
+        return record, {}
+
+    tasks = generation_tasks(content, run_type, shared_prefix)
+    record = dict(record)
+    errors = {}
+    with tracing.span("reask", fields=",".join(missing)):
+        for name in missing:
+            try:
+                if name == "tips":
+                    have = record.get("tips") or []
+                    system, user = tasks["Email Tips"]
+                    if have:
+                        user += (
+                            f"\n\nThese tips already exist; write {TIP_COUNT - len(have)} different ones:\n"
+                            + "\n".join(f"- {tip.title}" for tip in have)
+                        )
+                    # Not from the response cache: with no tips yet this is the first request again
+                    more = llm.chat_structured(system, user, EmailTips, use_cache=False, priority=priority).tips
+                    record["tips"] = have + more
+                    if len(record["tips"]) < TIP_COUNT:
+                        raise ValueError(f"only {len(record['tips'])} of {TIP_COUNT} email tips were generated")
+                else:
+                    task = tasks["Outline" if name == "outline" else "Narration"]
+                    record[name] = llm.chat(*task, use_cache=False, priority=priority) or ""
+                    if not record[name].strip():
+                        raise ValueError(f"the {name} came back empty")
+            except Exception as e:
+                errors[name] = e
+    return record, errors
+
+
+# Outline, narration and structured tips for one class, as {"outline", "narration", "tips": [EmailTip]}.
+# Shared and separate mode stream outline and narration (on_update(name, text) as in
+# llm.stream_generations) while the tips are requested as JSON alongside; when streaming in
+# shared mode the other requests wait for the first token of the first one so they find its
+# prefix cached. Combined mode makes one structured request. Either way only missing fields
+# are re-asked. use_cache=False skips the response cache (to regenerate). Returns
+# (record, {artifact name: error}).
+def generate_class(content, run_type, mode=SHARED, tasks=None, on_update=None, priority=rate_limit.INTERACTIVE, use_cache=True):
+    errors = {}
+    if mode == COMBINED:
+        try:
+            material = llm.chat_structured(*combined_task(content, run_type), ClassMaterial, use_cache=use_cache, priority=priority)
+            record = material.model_dump()
+            record["tips"] = material.tips
+        except ValidationError:
+            record = {}
+    else:
+        tasks = dict(tasks or generation_tasks(content, run_type, mode == SHARED))
+        tips_system, tips_user = tasks.pop("Email Tips")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            tips_future = None
+
+            def start_tips():
+                nonlocal tips_future
+                if tips_future is None:
+                    tips_future = pool.submit(
+                        llm.chat_structured, tips_system, tips_user, EmailTips, use_cache=use_cache, priority=priority
+                    )
+
+            if on_update and mode == SHARED:
+                def update(name, text):
+                    start_tips()
+                    on_update(name, text)
+
+                results, errors = llm.stream_generations(tasks, update, priority=priority, prefix_first=True, use_cache=use_cache)
+            elif on_update:
+                start_tips()
+                results, errors = llm.stream_generations(tasks, on_update, priority=priority, use_cache=use_cache)
+            else:
+                start_tips()
+                results, errors = llm.run_generations(tasks, priority=priority, use_cache=use_cache)
+            start_tips()
+            record = {"outline": results.get("Outline", ""), "narration": results.get("Narration", "")}
+            try:
+                record["tips"] = tips_future.result().tips
+            except ValidationError:
+                record["tips"] = []
+            except Exception as e:
+                errors["Email Tips"] = e
+
+    # Requests that failed outright were already retried by llm; don't ask a third time
+    record, still_missing = fill_missing(
+        record, content, run_type, priority, skip={FIELDS[name] for name in errors}, shared_prefix=mode != SEPARATE
+    )
+    names = {field: name for name, field in FIELDS.items()}
+    errors.update({names[field]: error for field, error in still_missing.items()})
+    return record, errors
+
+
+# Write the outline, narration script and email tips for one class into directory
+def write_class_files(directory, outline_text, script_text, tips):
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for artifact in artifacts.class_artifacts(outline_text, script_text, tips).values():
+        path = os.path.join(directory, artifact.filename)
+        with open(path, "wb") as f:
+            f.write(artifact.data)
+        files.append(path)
+    return files
+
+
+# Background job handler (see jobs.py) for one class. params: content, run_type, heading,
+# suffix for the download names, mode (one of MODES), force and optionally tasks to use instead
+# of generation_tasks(). Content generated before with the default prompts is reused from the
+# section store unless force is set, which also bypasses the response cache and replaces the
+# stored material; new content is streamed and published as the job's partial result while it
+# is written.
+def class_job(params, report):
+    content, run_type = params["content"], params["run_type"]
+    tasks = params.get("tasks")
+    store = section_store.default_store()
+    content_hash = section_store.section_hash(content, run_type)
+    force = params.get("force", False)
+    record = store.get(content_hash) if tasks is None and not force else None
+    reused = record is not None
+    errors = {}
+
+    if record is None:
+        texts = {}
+
+        def on_update(name, text):
+            texts[name] = text
+            report(message="Generating outline, narration and email tips", partial={"texts": texts})
+
+        report(message="Generating outline, narration and email tips")
+        record, errors = generate_class(content, run_type, params.get("mode", SHARED), tasks, on_update, use_cache=not force)
+        if not any(record.get(field) for field in FIELDS.values()):
+            raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+        report(0.9, "Building downloads")
+        record = {
+            "outline": record.get("outline", ""),
+            "narration": record.get("narration", ""),
+            "tips": format_tips(record.get("tips") or []),
+        }
+        if not errors and tasks is None:
+            store.put(content_hash, params.get("heading", ""), record["outline"], record["narration"], record["tips"])
+
+    suffix = params.get("suffix", "")
+    job_artifacts = artifacts.class_artifacts(record["outline"], record["narration"], record["tips"], suffix)
+    for i, tip in enumerate(record["tips"]):
+        job_artifacts[f"Email Tip {i + 1}"] = artifacts.docx_artifact(tip, f"email_tip_{i + 1}{suffix}.docx")
+    result = {
+        "outline": record["outline"],
+        "narration": record["narration"],
+        "tips": record["tips"],
+        "reused": reused,
+        "suffix": suffix,
+        "errors": {name: str(error) for name, error in errors.items()},
+    }
+    return result, job_artifacts
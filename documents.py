@@ -0,0 +1,237 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import extraction
+import retrieval
+import tracing
+from cache_store import CACHE_DIR, cache_key
+
+# Uploads are spooled here under their SHA-256, so pages can be read from disk by any rerun,
+# job worker or extraction process without keeping the file or its text in memory
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+# Spooled uploads not opened for this long are deleted (same lifetime as the page cache)
+UPLOAD_TTL = 30 * 24 * 3600
+# Extracted blocks of extraction.PAGE_RANGE_SIZE pages kept in memory per document
+MAX_BLOCKS = 4
+# Open documents and retrieval indexes kept per process, shared across reruns and sessions
+MAX_DOCUMENTS = 32
+MAX_INDEXES = 4
+
+_lock = threading.Lock()
+_documents = OrderedDict()
+_indexes = OrderedDict()
+
+
+def _remember(cache, key, value, limit):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def _spool_path(sha256, filename):
+    return os.path.join(UPLOAD_DIR, f"{sha256}.{extraction.file_kind(filename)}")
+
+
+def _prune_uploads():
+    cutoff = time.time() - UPLOAD_TTL
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# An uploaded PDF or DOCX whose pages are extracted on demand. Only the page count is read
+# when it is opened; pages are extracted a block (extraction.PAGE_RANGE_SIZE pages) at a time
+# the first time they are needed, and each block is cached in extraction.document_cache.
+# The page-offset index (offsets()) locates every page in the document text, so the text can
+# be measured and cut into page ranges without materialising it.
+class Document:
+    def __init__(self, filename, sha256, path):
+        self.filename = filename
+        self.sha256 = sha256
+        self.path = path
+        self.kind = extraction.file_kind(filename)
+        self.backend = extraction.pdf_backend() if self.kind == "pdf" else None
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self._offsets = None
+        with tracing.span("open_document", kind=self.kind) as record:
+            self.page_count = extraction.pdf_page_count(path, self.backend) if self.kind == "pdf" else 1
+            record["pages"] = self.page_count
+
+    # JSON-serialisable reference for job params; see from_ref()
+    def ref(self):
+        return {"filename": self.filename, "sha256": self.sha256}
+
+    def __len__(self):
+        return self.page_count
+
+    def __iter__(self):
+        for start in range(0, self.page_count, extraction.PAGE_RANGE_SIZE):
+            yield from self._block(start)
+
+    def __getitem__(self, page):
+        return self._block(page - page % extraction.PAGE_RANGE_SIZE)[page % extraction.PAGE_RANGE_SIZE]
+
+    def _key(self, name, *parts):
+        return cache_key(name, extraction.EXTRACTOR_VERSION, self.kind, self.backend, self.sha256, *parts)
+
+    def _block_key(self, start):
+        return self._key("page_block", start, extraction.PAGE_RANGE_SIZE)
+
+    # extraction.extract_range() arguments for the block starting at page start
+    def _block_args(self, start):
+        return self.kind, self.path, start, min(start + extraction.PAGE_RANGE_SIZE, self.page_count), self.backend
+
+    def _missing_blocks(self):
+        starts = range(0, self.page_count, extraction.PAGE_RANGE_SIZE)
+        return [start for start in starts if not extraction.document_cache.has(self._block_key(start))]
+
+    def _block(self, start):
+        with self._lock:
+            if start in self._blocks:
+                self._blocks.move_to_end(start)
+                return self._blocks[start]
+        key = self._block_key(start)
+        cached = extraction.document_cache.get(key)
+        if cached is not None:
+            pages = json.loads(cached)
+        else:
+            with tracing.span("extract_block", kind=self.kind, start=start) as record:
+                pages = extraction.extract_range(*self._block_args(start))
+                record["pages"] = len(pages)
+            extraction.document_cache.set(key, json.dumps(pages))
+        with self._lock:
+            _remember(self._blocks, start, pages, MAX_BLOCKS)
+        return pages
+
+    def pages(self, start=0, stop=None):
+        stop = self.page_count if stop is None else min(stop, self.page_count)
+        first = start - start % extraction.PAGE_RANGE_SIZE
+        pages = []
+        for block in range(first, stop, extraction.PAGE_RANGE_SIZE):
+            pages.extend(self._block(block))
+        return pages[start - first:stop - first]
+
+    # Text of pages [start, stop), one line break between pages
+    def text(self, start=0, stop=None):
+        return "\n".join(self.pages(start, stop))
+
+    # Page-offset index: character offset of every page in text(), plus the total length.
+    # Built by reading the pages once and cached alongside them.
+    def offsets(self):
+        if self._offsets is None:
+            key = self._key("page_offsets")
+            cached = extraction.document_cache.get(key)
+            if cached is None:
+                offsets, total = [], 0
+                for page in self:
+                    offsets.append(total)
+                    total += len(page) + 1
+                offsets.append(max(total - 1, 0))
+                extraction.document_cache.set(key, json.dumps(offsets))
+            else:
+                offsets = json.loads(cached)
+            self._offsets = offsets
+        return self._offsets
+
+    @property
+    def char_count(self):
+        return self.offsets()[-1]
+
+    # Page holding character offset of text()
+    def page_at(self, offset):
+        return max(bisect.bisect_right(self.offsets(), offset, hi=self.page_count) - 1, 0)
+
+    # Consecutive page ranges [(start, stop)] of at most max_chars of text each (a single
+    # longer page gets a range of its own)
+    def page_ranges(self, max_chars):
+        offsets = self.offsets()
+        ranges, start = [], 0
+        while start < self.page_count:
+            stop = bisect.bisect_right(offsets, offsets[start] + max_chars, start + 1, self.page_count + 1) - 1
+            ranges.append((start, max(stop, start + 1)))
+            start = ranges[-1][1]
+        return ranges
+
+
+# Extract every block of these documents that is not cached yet. The blocks of all documents
+# go to the extraction worker pool together and straight into the cache as they finish, so no
+# document is ever in memory whole; progress(done, total) is called as blocks finish.
+def prefetch(documents, progress=None):
+    blocks = [(document, start) for document in documents for start in document._missing_blocks()]
+    with tracing.span("prefetch", documents=len(documents), blocks=len(blocks)):
+        ranges = [document._block_args(start) for document, start in blocks]
+        for done, (position, pages) in enumerate(extraction.iter_ranges(ranges), start=1):
+            document, start = blocks[position]
+            extraction.document_cache.set(document._block_key(start), json.dumps(pages))
+            if progress:
+                progress(done, len(blocks))
+
+
+# Document for an upload (bytes or any buffer), spooled to disk on first sight. The same
+# content opened again, in any session, reuses the spooled file and its extracted pages.
+def open_document(filename, data):
+    if extraction.file_kind(filename) is None:
+        raise ValueError(f"Unsupported file type: {filename}")
+    sha256 = hashlib.sha256(data).hexdigest()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = _spool_path(sha256, filename)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        _prune_uploads()
+        # Written under a temporary name so other processes never open a partial file
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+    return _document(filename, sha256, path)
+
+
+def _document(filename, sha256, path):
+    key = (sha256, filename)
+    with _lock:
+        document = _documents.get(key)
+    if document is None:
+        document = Document(filename, sha256, path)
+    with _lock:
+        _remember(_documents, key, document, MAX_DOCUMENTS)
+    return document
+
+
+# Document for a ref() made by this or another server process sharing the cache directory
+def from_ref(ref):
+    path = _spool_path(ref["sha256"], ref["filename"])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{ref['filename']} is no longer available; upload it again")
+    os.utime(path)
+    return _document(ref["filename"], ref["sha256"], path)
+
+
+# Retrieval index over the chunks of these documents, built once per document set and index
+# class and shared by every session and job in the process
+def index_for(documents, index_cls=retrieval.BM25Index):
+    key = (index_cls.__name__, tuple((doc.sha256, doc.filename) for doc in documents))
+    with _lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = index_cls(retrieval.chunk_documents((doc.filename, doc) for doc in documents))
+        with _lock:
+            _remember(_indexes, key, index, MAX_INDEXES)
+    return index
+
+
+# Forget open documents and indexes held in memory (spooled files and cached pages stay)
+def clear():
+    with _lock:
+        _documents.clear()
+        _indexes.clear()
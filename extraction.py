@@ -0,0 +1,178 @@
+import io
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from docx import Document
+from PyPDF2 import PdfReader
+from cache_store import SQLiteCache
+
+# Faster PDF parsers are optional; PyPDF2 is always available as the fallback
+try:
+    import fitz
+except ImportError:
+    fitz = None
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+# Bump when extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 1
+
+# PDF backend for this deployment: pymupdf, pypdfium2, pdfplumber or pypdf2
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+
+# Large PDFs are split into page ranges of this size so one manual can use several cores
+PAGE_RANGE_SIZE = 50
+MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+# Extracted page blocks keyed by the SHA-256 of the uploaded bytes (see documents.py), shared
+# across reruns, sessions and apps
+document_cache = SQLiteCache("documents", max_bytes=1024 * 1024 * 1024, ttl=30 * 24 * 3600)
+
+
+def file_kind(filename):
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith(".docx"):
+        return "docx"
+    return None
+
+
+# Backends take the document as bytes or as the path of a file on disk. Paths let a parser
+# read only the pages it needs (and worker processes open the file themselves instead of
+# receiving a pickled copy of it).
+def _stream(source):
+    if not isinstance(source, str):
+        return io.BytesIO(source)
+    with open(source, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _pypdf2_page_count(source):
+    return len(PdfReader(_stream(source)).pages)
+
+
+def _pypdf2_page_range(source, start, stop):
+    reader = PdfReader(_stream(source))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _pymupdf_open(source):
+    return fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+
+
+def _pymupdf_page_count(source):
+    with _pymupdf_open(source) as doc:
+        return doc.page_count
+
+
+def _pymupdf_page_range(source, start, stop):
+    with _pymupdf_open(source) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _pypdfium2_page_count(source):
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _pypdfium2_page_range(source, start, stop):
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        return [pdf[i].get_textpage().get_text_range() for i in range(start, stop)]
+    finally:
+        pdf.close()
+
+
+def _pdfplumber_page_count(source):
+    with pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source)) as pdf:
+        return len(pdf.pages)
+
+
+def _pdfplumber_page_range(source, start, stop):
+    with pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source)) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+# name -> (installed, page count function, page range function)
+PDF_BACKENDS = {
+    "pymupdf": (fitz is not None, _pymupdf_page_count, _pymupdf_page_range),
+    "pypdfium2": (pypdfium2 is not None, _pypdfium2_page_count, _pypdfium2_page_range),
+    "pdfplumber": (pdfplumber is not None, _pdfplumber_page_count, _pdfplumber_page_range),
+    "pypdf2": (True, _pypdf2_page_count, _pypdf2_page_range),
+}
+
+
+# Configured backend if it is installed, otherwise PyPDF2
+def pdf_backend(name=None):
+    name = (name or PDF_BACKEND).lower()
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    return name if PDF_BACKENDS[name][0] else "pypdf2"
+
+
+def pdf_page_count(source, backend=None):
+    return PDF_BACKENDS[pdf_backend(backend)][1](source)
+
+
+def extract_pdf_page_range(source, start, stop, backend=None):
+    return PDF_BACKENDS[pdf_backend(backend)][2](source, start, stop)
+
+
+def extract_pdf_pages(data, backend=None):
+    backend = pdf_backend(backend)
+    return extract_pdf_page_range(data, 0, pdf_page_count(data, backend), backend)
+
+
+# Word documents have no reliable page boundaries, so the whole body is one page
+def extract_docx_pages(source):
+    doc = Document(source if isinstance(source, str) else io.BytesIO(source))
+    return ["\n".join(p.text for p in doc.paragraphs if p.text.strip())]
+
+
+# Pages [start, stop) of a file of this kind; a DOCX is always its single page
+def extract_range(kind, source, start, stop, backend=None):
+    if kind == "docx":
+        return extract_docx_pages(source)
+    return extract_pdf_page_range(source, start, stop, backend)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Worker processes are spawned once and reused across reruns; spawn avoids forking the
+# multi-threaded Streamlit server
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+# Extract many page ranges at once. ranges is a list of (kind, source, start, stop, backend),
+# normally the uncached blocks of every upload, and all of them go to the worker pool together
+# so small files are parsed side by side and large ones use several cores. Yields (position in
+# ranges, pages) as each range finishes. Sources should be paths so workers read the files
+# themselves instead of receiving a pickled copy.
+def iter_ranges(ranges):
+    # Not worth a round trip to the pool for a single block
+    if len(ranges) == 1:
+        yield 0, extract_range(*ranges[0])
+        return
+    pool = _get_pool()
+    futures = {pool.submit(extract_range, *args): position for position, args in enumerate(ranges)}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
@@ -0,0 +1,304 @@
+# fake_openai.py
+# Local stand-in for the OpenAI endpoints the apps use, so batch runs and benchmarks work
+# without network access or spend.
+#
+#   python fake_openai.py --port 8765
+#   OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python batch_generate.py ...
+#
+# Supported: chat completions (plain, stream=True and json_schema response formats, with
+# simulated prompt caching in usage.prompt_tokens_details), speech, file upload/content and batches.
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prompt caching as the real API reports it: a prefix seen before is cached in 128-token
+# blocks once it is at least 1024 tokens long (tokens are counted as 4 characters here)
+CACHE_BLOCK_CHARS = 128 * 4
+CACHE_MIN_CHARS = 1024 * 4
+
+# Roughly what a 64 kbps MP3 of spoken text weighs per input character
+SPEECH_BYTES_PER_CHAR = 600
+
+WORDS = (
+    "learners configure open select click review confirm save share settings account "
+    "feature option menu window report calendar message folder team access update"
+).split()
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.0, response_words=200, seed=0):
+        self.latency = latency
+        self.response_words = response_words
+        self.files = {}
+        self.batches = {}
+        self.calls = {}
+        self.prefixes = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-fake-{next(self._ids)}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def words(self, n):
+        with self._lock:
+            return " ".join(self._random.choice(WORDS) for _ in range(n))
+
+    # Instance of a structured-outputs JSON schema: objects, arrays of five, strings of words
+    def schema_instance(self, schema, defs, name=""):
+        if "$ref" in schema:
+            return self.schema_instance(defs[schema["$ref"].split("/")[-1]], defs, name)
+        kind = schema.get("type")
+        if kind == "object":
+            return {key: self.schema_instance(sub, defs, key) for key, sub in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self.schema_instance(schema.get("items", {}), defs, name) for _ in range(5)]
+        if kind in ("integer", "number"):
+            return 1
+        if kind == "boolean":
+            return True
+        return self.words(self.response_words if name in ("outline", "narration") else 8)
+
+    def cached_tokens(self, messages):
+        prompt = "".join(f"{m.get('role')}\n{m.get('content', '')}\n" for m in messages)
+        digest = hashlib.sha1()
+        cached = 0
+        with self._lock:
+            for end in range(CACHE_BLOCK_CHARS, len(prompt) + 1, CACHE_BLOCK_CHARS):
+                digest.update(prompt[end - CACHE_BLOCK_CHARS:end].encode("utf-8"))
+                key = digest.hexdigest()
+                if key in self.prefixes and end == cached + CACHE_BLOCK_CHARS:
+                    cached = end
+                self.prefixes.add(key)
+        return cached // 4 if cached >= CACHE_MIN_CHARS else 0
+
+    def completion(self, body):
+        messages = body.get("messages", [])
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            text = json.dumps(self.schema_instance(schema, schema.get("$defs", {})))
+        else:
+            text = self.words(self.response_words)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        return {
+            "id": self.new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": prompt_tokens + len(text) // 4,
+                "prompt_tokens_details": {"cached_tokens": self.cached_tokens(messages)},
+            },
+        }
+
+    # Silent MPEG frames sized like real narration of the input text
+    def speech(self, body):
+        frame = b"\xff\xfb\x90\x64" + bytes(413)
+        return frame * max(1, len(body.get("input", "")) * SPEECH_BYTES_PER_CHAR // len(frame))
+
+    def create_file(self, filename, purpose, data):
+        file_id = self.new_id("file")
+        self.files[file_id] = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+            "data": data,
+        }
+        return self.file_object(file_id)
+
+    def file_object(self, file_id):
+        return {k: v for k, v in self.files[file_id].items() if k != "data"}
+
+    # Batches run immediately but report in_progress on the first retrieve so clients exercise polling
+    def create_batch(self, body):
+        batch_id = self.new_id("batch")
+        lines = self.files[body["input_file_id"]]["data"].decode("utf-8").splitlines()
+        output = []
+        for line in filter(None, lines):
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": self.new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": self.new_id("req"), "body": self.completion(request["body"])},
+                "error": None,
+            }))
+        output_file = self.create_file(f"{batch_id}_output.jsonl", "batch_output", "\n".join(output).encode("utf-8"))
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": len(output), "completed": 0, "failed": 0},
+            "_output_file_id": output_file["id"],
+        }
+        return self.batch_object(batch_id)
+
+    def retrieve_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and batch.get("_polled"):
+            batch["status"] = "completed"
+            batch["output_file_id"] = batch["_output_file_id"]
+            batch["request_counts"]["completed"] = batch["request_counts"]["total"]
+        batch["_polled"] = True
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id):
+        return {k: v for k, v in self.batches[batch_id].items() if not k.startswith("_")}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def send_json(self, payload, status=200):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_bytes(self, data, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def stream_completion(self, completion, include_usage=False):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = completion["choices"][0]["message"]["content"].split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion["id"],
+                    "object": "chat.completion.chunk",
+                    "created": completion["created"],
+                    "model": completion["model"],
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if include_usage:
+                chunk = {
+                    "id": completion["id"],
+                    "object": "chat.completion.chunk",
+                    "created": completion["created"],
+                    "model": completion["model"],
+                    "choices": [],
+                    "usage": completion["usage"],
+                }
+                self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+
+        def write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+        def do_POST(self):
+            path = self.path.split("?")[0].rstrip("/")
+            body = self.read_body()
+            fake.count(path)
+            if fake.latency:
+                time.sleep(fake.latency)
+
+            if path.endswith("/chat/completions"):
+                request = json.loads(body)
+                completion = fake.completion(request)
+                if request.get("stream"):
+                    self.stream_completion(completion, (request.get("stream_options") or {}).get("include_usage", False))
+                else:
+                    self.send_json(completion)
+            elif path.endswith("/audio/speech"):
+                self.send_bytes(fake.speech(json.loads(body)), "audio/mpeg")
+            elif path.endswith("/files"):
+                message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                    b"Content-Type: " + self.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + body
+                )
+                fields, filename, data = {}, "upload", b""
+                for part in message.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    if part.get_filename():
+                        filename, data = part.get_filename(), part.get_payload(decode=True)
+                    else:
+                        fields[name] = part.get_content().strip()
+                self.send_json(fake.create_file(filename, fields.get("purpose", "batch"), data))
+            elif path.endswith("/batches"):
+                self.send_json(fake.create_batch(json.loads(body)))
+            else:
+                self.send_json({"error": {"message": f"Unknown endpoint {path}"}}, status=404)
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            parts = path.split("/")
+            fake.count(path)
+            if "files" in parts and path.endswith("/content"):
+                self.send_bytes(fake.files[parts[-2]]["data"], "application/octet-stream")
+            elif "files" in parts:
+                self.send_json(fake.file_object(parts[-1]))
+            elif "batches" in parts:
+                self.send_json(fake.retrieve_batch(parts[-1]))
+            else:
+                self.send_json({"error": {"message": f"Unknown endpoint {path}"}}, status=404)
+
+    return Handler
+
+
+# Start a fake server on a background thread; returns (server, fake state, base_url)
+def start_server(port=0, **options):
+    fake = FakeOpenAI(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--response-words", type=int, default=200)
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(args.port, latency=args.latency, response_words=args.response_words)
+    print(f"Fake OpenAI API listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,15 @@
 import openai
 import sys
 import os
+import tts
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 text = sys.stdin.read()
 output_path = sys.argv[1]
 
-response = openai.audio.speech.create(
-    model="tts-1",
-    voice="alloy",
-    input=text
-)
+# Long scripts are split at sentence boundaries and synthesized in parallel into one MP3
+tts.synthesize_script(text, output_path)
 
-with open(output_path, "wb") as f:
-    f.write(response.content)
+stats = tts.segment_cache.stats()
+print(f"Segments reused from cache: {stats['hits']}, synthesized: {stats['misses']}", file=sys.stderr)
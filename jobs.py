@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import artifacts
+from cache_store import CACHE_DIR
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Idle workers also look for jobs submitted by other server processes this often
+POLL_INTERVAL = 1.0
+# Progress and partial results are written at most this often per job
+PROGRESS_INTERVAL = 0.5
+# Finished jobs and their artifacts are kept this long, so a reloaded page can still fetch them
+RETENTION = 7 * 24 * 3600
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Background jobs persisted in SQLite and run by worker threads, so generation is no longer
+# tied to a Streamlit script run: reruns and page reloads only poll status(job_id), and many
+# users' jobs overlap. Every Streamlit server process sharing the cache directory takes jobs
+# of the kinds it has handlers for; jobs left running by a process that died are requeued.
+#
+# A handler is called as handler(params, report) and returns (result, {name: Artifact});
+# result must be JSON-serialisable. report(fraction, message, partial) publishes progress
+# and an optional partial result while the job runs.
+class JobQueue:
+    def __init__(self, workers=WORKERS, cache_dir=None):
+        cache_dir = cache_dir or CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "jobs.sqlite3")
+        self.workers = workers
+        self._handlers = {}
+        self._threads = []
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT, status TEXT, params TEXT, result TEXT, error TEXT, "
+            "progress REAL, message TEXT, owner INTEGER, created REAL, updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_artifacts ("
+            "job_id TEXT, name TEXT, filename TEXT, mime TEXT, data BLOB, PRIMARY KEY (job_id, name))"
+        )
+        self._recover()
+        self._prune()
+
+    def _recover(self):
+        with self._lock:
+            owners = self._conn.execute("SELECT DISTINCT owner FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            for (owner,) in owners:
+                if owner is None or (owner != os.getpid() and not _alive(owner)):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = NULL, message = ? WHERE status = ? AND owner IS ?",
+                        (QUEUED, "Requeued after a server restart", RUNNING, owner),
+                    )
+
+    def _prune(self):
+        cutoff = time.time() - RETENTION
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM job_artifacts WHERE job_id IN (SELECT id FROM jobs WHERE status IN (?, ?) AND updated < ?)",
+                (DONE, FAILED, cutoff),
+            )
+            self._conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff))
+
+    # Handle jobs of this kind in this process; worker threads start with the first handler
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._wake.set()
+
+    def submit(self, kind, params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, progress, message, created, updated) VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), "Waiting for a worker", now, now),
+            )
+        self._wake.set()
+        return job_id
+
+    # Job state as a dict (result holds the partial result while running), or None if unknown
+    def status(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, result, error, progress, message, created, updated FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            position = None
+            if row is not None and row[2] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?", (QUEUED, row[7])
+                ).fetchone()[0]
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "progress": row[5],
+            "message": row[6],
+            "queue_position": position,
+            "created": row[7],
+            "updated": row[8],
+        }
+
+    def artifacts(self, job_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, filename, mime, data FROM job_artifacts WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {name: artifacts.Artifact(filename, data, mime) for name, filename, mime, data in rows}
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {"workers": len(self._threads), **dict(rows)}
+
+    # Atomically move the oldest queued job of a handled kind to running
+    def _claim(self):
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id, kind, params FROM jobs WHERE status = ? AND kind IN ({','.join('?' * len(kinds))}) "
+                    "ORDER BY created LIMIT 1",
+                    (QUEUED, *kinds),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, message = ?, updated = ? WHERE id = ?",
+                        (RUNNING, os.getpid(), "Started", time.time(), row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def _run(self, job_id, kind, params):
+        last = 0.0
+
+        def report(fraction=None, message=None, partial=None):
+            nonlocal last
+            now = time.monotonic()
+            if now - last < PROGRESS_INTERVAL:
+                return
+            last = now
+            fields = {}
+            if fraction is not None:
+                fields["progress"] = fraction
+            if message is not None:
+                fields["message"] = message
+            if partial is not None:
+                fields["result"] = json.dumps(partial)
+            self._update(job_id, **fields)
+
+        try:
+            result, job_artifacts = self._handlers[kind](json.loads(params), report)
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", message="Failed")
+            return
+
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO job_artifacts (job_id, name, filename, mime, data) VALUES (?, ?, ?, ?, ?)",
+                        [(job_id, name, a.filename, a.mime, a.data) for name, a in job_artifacts.items()],
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, result = ?, progress = 1, message = ?, updated = ? WHERE id = ?",
+                        (DONE, json.dumps(result), "Done", time.time(), job_id),
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"Could not save results: {e}", message="Failed")
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.OperationalError:
+                job = None
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(*job)
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+# Process-wide queue used by the Streamlit apps; survives reruns like any imported module
+def default_queue():
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
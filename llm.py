@@ -0,0 +1,235 @@
+import queue
+import time
+import openai
+import openai_client
+import rate_limit
+import tracing
+from cache_store import SQLiteCache, cache_key
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+MODEL = "gpt-4.1-mini"
+REQUEST_TIMEOUT = 120
+MAX_WORKERS = 4
+# Completion tokens assumed when reserving rate-limit capacity before the real usage is known
+EXPECTED_COMPLETION_TOKENS = 1000
+
+# Identical prompts come back on every Streamlit rerun; answer those from disk.
+# Turned off when talking to a fake server so its placeholder text never reaches the real cache.
+CACHE_ENABLED = True
+response_cache = SQLiteCache("responses", max_bytes=256 * 1024 * 1024, ttl=7 * 24 * 3600)
+
+# Errors worth retrying: the request never produced a usable answer but may on a second try
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(messages):
+    return sum(len(m["content"]) for m in messages) // 4 + EXPECTED_COMPLETION_TOKENS
+
+
+# Single chat completion with per-call timeout and exponential backoff on transient errors.
+# Every attempt waits for its turn in the process-wide rate limiter first.
+@retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=wait_random_exponential(min=1, max=20),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+def _create(model, messages, timeout, priority=rate_limit.INTERACTIVE, **params):
+    estimated = estimate_tokens(messages)
+    with tracing.span("chat.completions.create", model=model, priority=priority) as record:
+        record["queue_wait_s"] = round(rate_limit.chat_limiter.acquire(estimated, priority), 4)
+        response = openai_client.get_client().chat.completions.create(model=model, messages=messages, timeout=timeout, **params)
+        if getattr(response, "usage", None) is not None:
+            tracing.add_usage(record, response.usage)
+            rate_limit.chat_limiter.reconcile(estimated, response.usage.total_tokens)
+    return response
+
+
+# Streaming counterpart of _create(). Opening the stream is retried (each attempt queues in
+# the rate limiter again); the span stays open until the last chunk, and the final usage
+# chunk (stream_options include_usage) feeds the trace and the rate limiter.
+def _create_stream(model, messages, timeout, priority=rate_limit.INTERACTIVE, **params):
+    estimated = estimate_tokens(messages)
+    with tracing.span("chat.completions.create", model=model, priority=priority, stream=True) as record:
+        start = time.perf_counter()
+        stream = _open_stream(model, messages, timeout, estimated, priority, record, **params)
+        for chunk in stream:
+            if "first_token_s" not in record and chunk.choices:
+                record["first_token_s"] = round(time.perf_counter() - start, 4)
+            if getattr(chunk, "usage", None) is not None:
+                tracing.add_usage(record, chunk.usage)
+                rate_limit.chat_limiter.reconcile(estimated, chunk.usage.total_tokens)
+            yield chunk
+
+
+@retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=wait_random_exponential(min=1, max=20),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+def _open_stream(model, messages, timeout, estimated, priority, record, **params):
+    record["queue_wait_s"] = round(rate_limit.chat_limiter.acquire(estimated, priority), 4)
+    return openai_client.get_client().chat.completions.create(
+        model=model, messages=messages, timeout=timeout, stream=True,
+        stream_options={"include_usage": True}, **params,
+    )
+
+
+# Chat completion returning the message text, served from response_cache when the
+# same (model, system prompt, user prompt, parameters) was answered before
+def chat(system, user, model=MODEL, timeout=REQUEST_TIMEOUT, use_cache=True, priority=rate_limit.INTERACTIVE, **params):
+    key = cache_key(model, system, user, params)
+    use_cache = use_cache and CACHE_ENABLED
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    content = _create(model, build_messages(system, user), timeout, priority, **params).choices[0].message.content
+    if use_cache and content:
+        response_cache.set(key, content)
+    return content
+
+
+# Same as chat() but yields text deltas as they arrive (stream=True). A cached answer is
+# yielded in one piece; the assembled text is cached once the stream completes.
+def chat_stream(system, user, model=MODEL, timeout=REQUEST_TIMEOUT, use_cache=True, priority=rate_limit.INTERACTIVE, **params):
+    key = cache_key(model, system, user, params)
+    use_cache = use_cache and CACHE_ENABLED
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    for chunk in _create_stream(model, build_messages(system, user), timeout, priority, **params):
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+
+    content = "".join(parts)
+    if use_cache and content:
+        response_cache.set(key, content)
+
+
+# response_format for structured outputs: the answer must be JSON matching the pydantic model
+# (declare the model with extra="forbid" so the schema is accepted in strict mode)
+def json_schema_format(model_cls):
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model_cls.__name__, "schema": model_cls.model_json_schema(), "strict": True},
+    }
+
+
+# chat() whose answer is validated into an instance of model_cls. A malformed answer raises
+# pydantic.ValidationError and, unlike plain chat(), is never cached.
+def chat_structured(system, user, model_cls, model=MODEL, timeout=REQUEST_TIMEOUT, use_cache=True, priority=rate_limit.INTERACTIVE, **params):
+    params["response_format"] = json_schema_format(model_cls)
+    key = cache_key(model, system, user, params)
+    use_cache = use_cache and CACHE_ENABLED
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return model_cls.model_validate_json(cached)
+
+    content = _create(model, build_messages(system, user), timeout, priority, **params).choices[0].message.content
+    result = model_cls.model_validate_json(content or "")
+    if use_cache:
+        response_cache.set(key, content)
+    return result
+
+
+def build_messages(system, user):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+# Run independent generations concurrently.
+# tasks maps an artifact name to (system prompt, user prompt); returns (results, errors)
+# keyed by the same names so callers can show whatever finished even if one call failed.
+def run_generations(tasks, max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT, priority=rate_limit.INTERACTIVE, use_cache=True):
+    results, errors = {}, {}
+    if not tasks:
+        return results, errors
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        futures = {
+            pool.submit(chat, system, user, timeout=timeout, use_cache=use_cache, priority=priority): name
+            for name, (system, user) in tasks.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    return results, errors
+
+
+_DONE = object()
+
+
+# Streaming counterpart of run_generations(). Streams run on worker threads while
+# on_update(name, text_so_far) is called on the calling thread, which is what Streamlit
+# needs to redraw placeholders. Queued deltas are coalesced so each redraw shows the latest text.
+# With prefix_first (tasks sharing a long prompt prefix) the other tasks start once the first
+# one has produced output, i.e. once the provider has processed and cached the shared prefix.
+def stream_generations(tasks, on_update, max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT, priority=rate_limit.INTERACTIVE, prefix_first=False, use_cache=True):
+    results, errors = {}, {}
+    if not tasks:
+        return results, errors
+
+    updates = queue.Queue()
+
+    def worker(name, system, user):
+        text = ""
+        try:
+            for delta in chat_stream(system, user, timeout=timeout, use_cache=use_cache, priority=priority):
+                text += delta
+                updates.put((name, text, None))
+            updates.put((name, text, _DONE))
+        except Exception as e:
+            updates.put((name, text, e))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        items = list(tasks.items())
+        held = items[1:] if prefix_first else []
+        for name, (system, user) in items[:len(items) - len(held)]:
+            pool.submit(worker, name, system, user)
+
+        remaining = len(tasks)
+        while remaining:
+            pending = [updates.get()]
+            while True:
+                try:
+                    pending.append(updates.get_nowait())
+                except queue.Empty:
+                    break
+
+            latest = {}
+            for name, text, status in pending:
+                latest[name] = text
+                if status is _DONE:
+                    results[name] = text
+                    remaining -= 1
+                elif status is not None:
+                    errors[name] = status
+                    remaining -= 1
+            for name, text in latest.items():
+                on_update(name, text)
+            for name, (system, user) in held:
+                pool.submit(worker, name, system, user)
+            held = []
+
+    return results, errors
@@ -0,0 +1,83 @@
+# Offline bulk generation through the OpenAI Batch API: every outline/narration/tips prompt (or
+# combined ClassMaterial prompt) for a set of sections goes into one JSONL job, billed at the
+# batch discount and outside the synchronous rate limits.
+import json
+import time
+import openai_client
+import course
+import llm
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Task name of the one ClassMaterial request per section in combined mode
+COMBINED_TASK = "Combined"
+# Response format per task name for tasks that are answered as JSON
+TASK_FORMATS = {**course.TASK_FORMATS, COMBINED_TASK: course.ClassMaterial}
+
+
+def custom_id(job_id, artifact):
+    return f"{job_id}::{artifact}"
+
+
+# Prompts for one section in this prompt mode (one of course.MODES), keyed by task name
+def section_tasks(content, run_type, mode=course.SHARED):
+    if mode == course.COMBINED:
+        return {COMBINED_TASK: course.combined_task(content, run_type)}
+    return course.generation_tasks(content, run_type, mode == course.SHARED)
+
+
+# One batch request line per (section, task); jobs are (job id, content) pairs
+def build_requests(jobs, run_type, model=llm.MODEL, mode=course.SHARED):
+    requests = []
+    for job_id, content in jobs:
+        for artifact, (system, user) in section_tasks(content, run_type, mode).items():
+            body = {"model": model, "messages": llm.build_messages(system, user)}
+            if artifact in TASK_FORMATS:
+                body["response_format"] = llm.json_schema_format(TASK_FORMATS[artifact])
+            requests.append({
+                "custom_id": custom_id(job_id, artifact),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            })
+    return requests
+
+
+# Upload the requests as JSONL and start the batch; returns the batch id
+def submit(requests, client=None):
+    client = client or openai_client.get_client()
+    payload = "\n".join(json.dumps(request) for request in requests).encode("utf-8")
+    batch_file = client.files.create(file=("batch_requests.jsonl", payload), purpose="batch")
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h")
+    return batch.id
+
+
+# Poll until the batch reaches a terminal status; progress(batch) is called after every poll
+def wait(batch_id, client=None, poll_interval=30, progress=None):
+    client = client or openai_client.get_client()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if progress:
+            progress(batch)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+# Message text per custom_id, plus the error per custom_id for requests that failed
+def fetch_results(batch, client=None):
+    client = client or openai_client.get_client()
+    results, errors = {}, {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                errors[record["custom_id"]] = record.get("error") or response.get("body")
+                continue
+            results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results, errors
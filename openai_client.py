@@ -0,0 +1,78 @@
+import asyncio
+import os
+import threading
+import weakref
+import httpx
+import openai
+
+# HTTP/2 needs the optional h2 package; without it the pool simply stays on HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+TIMEOUT = httpx.Timeout(120.0, connect=10.0, pool=30.0)
+
+_lock = threading.Lock()
+_clients = {}
+# Event loop -> {(api key, base URL): client}. Pooled connections can keep their loop alive,
+# so entries for closed loops are also dropped whenever a client is requested.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _settings():
+    api_key = openai.api_key or os.getenv("OPENAI_API_KEY")
+    base_url = openai.base_url or os.getenv("OPENAI_BASE_URL")
+    return api_key, str(base_url) if base_url else None
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+# One pooled client per (api key, base URL) for the whole process. Streamlit keeps imported
+# modules between reruns, so connections (and their TLS sessions) survive every rerun and
+# are shared by all sessions. Retries are handled by llm.py/tts.py, so the SDK's own are off.
+def get_client():
+    key = _settings()
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            api_key, base_url = key
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=httpx.Client(limits=_limits(), timeout=TIMEOUT, http2=HTTP2),
+            )
+            _clients[key] = client
+        return client
+
+
+# Async counterpart; httpx async pools are bound to an event loop, so there is one per loop
+def get_async_client():
+    key = _settings()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for closed in [other for other in _async_clients.keys() if other.is_closed()]:
+            del _async_clients[closed]
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            api_key, base_url = key
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=TIMEOUT, http2=HTTP2),
+            )
+            clients[key] = client
+        return client
@@ -0,0 +1,190 @@
+import datetime
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+from docx import Document
+import artifacts
+import documents
+import llm
+import topics
+import tracing
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "QREF_Template.docx")
+
+# Template style used for each part of a QREF; missing styles fall back to Normal
+STYLES = {
+    "heading": "IT Heading 1",
+    "body": "IT Body Text",
+    "step": "IT Number_1",
+    "tip": "IT Tip",
+    "note": "IT Note",
+}
+
+_lock = threading.Lock()
+_templates = {}
+
+
+def clear_below_first_table(doc):
+    first_table = doc.tables[0]
+    last_tbl_elm = first_table._element
+    body_elm = doc._body._element
+    to_delete = []
+    found_table = False
+    for child in body_elm.iterchildren():
+        if child == last_tbl_elm:
+            found_table = True
+            continue
+        if found_table:
+            to_delete.append(child)
+    for element in to_delete:
+        body_elm.remove(element)
+
+
+def _style_ids(doc):
+    ids = {style.name: style.style_id for style in doc.styles}
+    return {part: ids.get(name, ids.get("Normal")) for part, name in STYLES.items()}
+
+
+# Cleaned template bytes and resolved style ids, prepared once per template file
+# (and again only if the file changes on disk)
+def prepared_template(template_path=TEMPLATE_PATH):
+    key = (template_path, os.path.getmtime(template_path))
+    with _lock:
+        prepared = _templates.get(key)
+        if prepared is None:
+            doc = Document(template_path)
+            clear_below_first_table(doc)
+            output = BytesIO()
+            doc.save(output)
+            prepared = _templates[key] = (output.getvalue(), _style_ids(doc))
+        return prepared
+
+
+def _add(doc, text, style_id):
+    paragraph = doc.add_paragraph(text)
+    # Setting the style id directly skips python-docx's by-name style lookup per paragraph
+    paragraph._p.style = style_id
+    return paragraph
+
+
+def create_qref_docx(app, function, audience, version, overview, steps, tips, related, template_path=TEMPLATE_PATH):
+    with tracing.span("create_qref_docx") as record:
+        template, styles = prepared_template(template_path)
+        doc = Document(BytesIO(template))
+
+        _add(doc, "OVERVIEW", styles["heading"])
+        _add(doc, overview, styles["body"])
+
+        for line in steps.strip().split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("### "):
+                _add(doc, line.replace("###", "").strip(), styles["heading"])
+            elif line.startswith("- "):
+                _add(doc, line.strip("- ").strip(), styles["step"])
+            else:
+                _add(doc, line, styles["step"])
+
+        _add(doc, "TIPS & NOTES", styles["heading"])
+        for tip in tips:
+            _add(doc, tip, styles["tip"])
+
+        _add(doc, "RELATED FEATURES", styles["heading"])
+        for item in related:
+            _add(doc, item, styles["note"])
+
+        output = BytesIO()
+        doc.save(output)
+        record["bytes"] = output.tell()
+        output.seek(0)
+        return output
+
+
+# Overview (text before the first ### heading, or the first two lines) and step lines
+def split_content(text):
+    lines = text.strip().splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().startswith("### "):
+            return " ".join(lines[:i]).strip(), "\n".join(lines[i:]).strip()
+    return " ".join(lines[:2]).strip(), "\n".join(lines[2:]).strip()
+
+
+def qref_filename(topic):
+    return f"QREF_{re.sub(r'[^A-Za-z0-9]+', '_', topic).strip('_')[:60] or 'topic'}.docx"
+
+
+# QREF document for extracted topic content, filled with the template placeholders
+def qref_artifact(topic, text, version=None):
+    overview, steps = split_content(text)
+    docx_file = create_qref_docx(
+        app="[App Name]",
+        function="[Function or Module]",
+        audience="[User Type]",
+        version=version or datetime.date.today().strftime("%B %d, %Y"),
+        overview=overview,
+        steps=steps,
+        tips=["[Add any helpful tips or reminders.]"],
+        related=["[Mention other relevant QREFs or tools.]"],
+    )
+    return artifacts.Artifact(qref_filename(topic), docx_file.getvalue(), artifacts.DOCX_MIME)
+
+
+# One QREF per topic, all in one ZIP. Content for every topic is extracted from the retrieval
+# index in parallel, then the documents are rendered concurrently; progress(done, total, topic)
+# is called on the calling thread. Returns (zip artifact, {topic: error}) so a failed topic
+# does not sink the whole library; raises ValueError when no topic could be rendered.
+def qref_library(selected, index, max_workers=llm.MAX_WORKERS, progress=None):
+    version = datetime.date.today().strftime("%B %d, %Y")
+    answers = topics.extract_topic_answers(selected, index)
+    rendered = {}
+    errors = {topic: ValueError("no content found for this topic") for topic in selected if topic not in answers}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(answers)))) as pool:
+        futures = {pool.submit(qref_artifact, topic, answer, version): topic for topic, answer in answers.items()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            topic = futures[future]
+            try:
+                rendered[topic] = future.result()
+            except Exception as e:
+                errors[topic] = e
+            if progress:
+                progress(done, len(futures), topic)
+
+    if not rendered:
+        raise ValueError("No QREF could be generated: " + "; ".join(f"{topic}: {e}" for topic, e in errors.items()))
+
+    # Numbered in selection order, which also keeps similar topic names apart
+    members = [
+        rendered[topic]._replace(filename=f"{i + 1:02d}_{rendered[topic].filename}")
+        for i, topic in enumerate(topic for topic in selected if topic in rendered)
+    ]
+    return artifacts.zip_artifact(members, "QREF_library.zip"), errors
+
+
+# Background job handlers (see jobs.py). params: topics (the selected topic names) and
+# documents (documents.Document refs of the uploads the topics were found in).
+def _index(params):
+    return documents.index_for([documents.from_ref(ref) for ref in params["documents"]])
+
+
+def qref_job(params, report):
+    report(0.1, "Extracting content for the selected topics")
+    answers = topics.extract_topic_answers(params["topics"], _index(params))
+    if not answers:
+        raise ValueError("The documents have no content on the selected topics")
+    report(0.9, "Rendering QREF")
+    content = "\n\n".join(answers.values())
+    return {"topics": params["topics"]}, {"QREF": qref_artifact(", ".join(params["topics"]), content)}
+
+
+def qref_library_job(params, report):
+    report(0.1, "Extracting content for the selected topics")
+    library, errors = qref_library(
+        params["topics"],
+        _index(params),
+        progress=lambda done, total, topic: report(0.1 + 0.9 * done / total, f"Rendered {topic} ({done}/{total})"),
+    )
+    return {"topics": params["topics"], "errors": {topic: str(e) for topic, e in errors.items()}}, {"QREF Library": library}
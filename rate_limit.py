@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# Lower value is served first: interactive Streamlit requests go ahead of batch runs
+INTERACTIVE = 0
+BATCH = 1
+
+
+# Process-wide scheduler for API calls. Requests-per-minute and tokens-per-minute are token
+# buckets refilled continuously; callers queue by (priority, arrival) and only the head of the
+# queue may take capacity, so a flood of batch work can never starve an interactive user.
+class RateLimiter:
+    def __init__(self, name, requests_per_minute, tokens_per_minute=None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_bucket = float(requests_per_minute)
+        self._token_bucket = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=500)
+        self.granted = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._request_bucket = min(self.requests_per_minute, self._request_bucket + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._token_bucket = min(self.tokens_per_minute, self._token_bucket + elapsed * self.tokens_per_minute / 60)
+
+    # Seconds until the head request fits in both buckets
+    def _delay(self, tokens):
+        delay = 0.0
+        if self._request_bucket < 1:
+            delay = (1 - self._request_bucket) * 60 / self.requests_per_minute
+        if self.tokens_per_minute and self._token_bucket < tokens:
+            delay = max(delay, (tokens - self._token_bucket) * 60 / self.tokens_per_minute)
+        return delay
+
+    # Block until this call may go out; returns the time spent waiting
+    def acquire(self, tokens=0, priority=INTERACTIVE):
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._queue[0] == ticket:
+                        delay = self._delay(tokens)
+                        if delay <= 0:
+                            heapq.heappop(self._queue)
+                            self._request_bucket -= 1
+                            self._token_bucket -= tokens
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                raise
+            finally:
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self._waits.append(waited)
+            self.granted += 1
+            return waited
+
+    # Correct the token bucket once the real usage is known
+    def reconcile(self, estimated_tokens, actual_tokens):
+        if not self.tokens_per_minute:
+            return
+        with self._cond:
+            self._token_bucket += min(estimated_tokens, self.tokens_per_minute) - actual_tokens
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            depth = len(self._queue)
+        return {
+            "queue_depth": depth,
+            "granted": self.granted,
+            "avg_wait_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_s": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            "max_wait_s": round(waits[-1], 3) if waits else 0.0,
+        }
+
+
+chat_limiter = RateLimiter(
+    "chat",
+    requests_per_minute=int(os.getenv("OPENAI_CHAT_RPM", "500")),
+    tokens_per_minute=int(os.getenv("OPENAI_CHAT_TPM", "200000")),
+)
+speech_limiter = RateLimiter("speech", requests_per_minute=int(os.getenv("OPENAI_TTS_RPM", "50")))
+embedding_limiter = RateLimiter(
+    "embeddings",
+    requests_per_minute=int(os.getenv("OPENAI_EMBEDDING_RPM", "500")),
+    tokens_per_minute=int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000")),
+)
+
+
+def stats():
+    return {limiter.name: limiter.stats() for limiter in (chat_limiter, speech_limiter, embedding_limiter)}
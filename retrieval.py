@@ -0,0 +1,147 @@
+import math
+import re
+from collections import Counter, defaultdict
+import numpy as np
+import openai_client
+import rate_limit
+import tracing
+from cache_store import SQLiteCache, cache_key
+from llm import RETRYABLE_ERRORS
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+CHUNK_WORDS = 250
+CHUNK_OVERLAP = 50
+TOP_K = 8
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with you your".split()
+)
+
+# Chunk embeddings keyed by (model, chunk text) so re-uploading a document never re-embeds it
+embedding_cache = SQLiteCache("embeddings", max_bytes=512 * 1024 * 1024)
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+# Split each page into overlapping word windows; every chunk keeps its filename and page number
+def chunk_pages(filename, pages, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for page_number, page in enumerate(pages, start=1):
+        words = page.split()
+        for start in range(0, len(words), step):
+            chunks.append({
+                "filename": filename,
+                "page": page_number,
+                "text": " ".join(words[start:start + chunk_words]),
+            })
+            if start + chunk_words >= len(words):
+                break
+    return chunks
+
+
+def chunk_documents(documents, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    chunks = []
+    for filename, pages in documents:
+        chunks.extend(chunk_pages(filename, pages, chunk_words, overlap))
+    return chunks
+
+
+# Format retrieved chunks with [filename, p. N] citations for the prompt
+def format_chunks(chunks):
+    return "\n\n".join(f"[{c['filename']}, p. {c['page']}]\n{c['text']}" for c in chunks)
+
+
+# Okapi BM25 over an inverted index; query cost depends on the postings touched, not corpus size
+class BM25Index:
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def idf(self, term):
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.chunks) - n + 0.5) / (n + 0.5))
+
+    def search(self, query, k=TOP_K):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [self.chunks[i] for i, _ in best]
+
+
+# One embeddings request, with the same backoff and rate limiting as chat requests
+@retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=wait_random_exponential(min=1, max=20),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+def _create_embeddings(model, inputs, priority=rate_limit.INTERACTIVE):
+    estimated = sum(len(text) for text in inputs) // 4
+    with tracing.span("embeddings.create", model=model, inputs=len(inputs)) as record:
+        record["queue_wait_s"] = round(rate_limit.embedding_limiter.acquire(estimated, priority), 4)
+        response = openai_client.get_client().embeddings.create(model=model, input=inputs)
+        if response.usage is not None:
+            tracing.add_usage(record, response.usage)
+            rate_limit.embedding_limiter.reconcile(estimated, response.usage.total_tokens)
+    return response
+
+
+def embed_texts(texts, model=EMBEDDING_MODEL, batch_size=256):
+    vectors = [None] * len(texts)
+    keys = [cache_key("embedding", model, text) for text in texts]
+    missing = []
+    for i, key in enumerate(keys):
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            vectors[i] = np.frombuffer(cached, dtype=np.float32)
+        else:
+            missing.append(i)
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        response = _create_embeddings(model, [texts[i] for i in batch])
+        for i, item in zip(batch, response.data):
+            vector = np.asarray(item.embedding, dtype=np.float32)
+            embedding_cache.set(keys[i], vector.tobytes())
+            vectors[i] = vector
+
+    return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+# Cosine-similarity search over chunk embeddings held in one NumPy matrix
+class EmbeddingIndex:
+    def __init__(self, chunks, model=EMBEDDING_MODEL):
+        self.chunks = chunks
+        self.model = model
+        matrix = embed_texts([c["text"] for c in chunks], model=model)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True) if matrix.size else 1.0
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def search(self, query, k=TOP_K):
+        if not self.chunks:
+            return []
+        vector = embed_texts([query], model=self.model)[0]
+        vector = vector / (np.linalg.norm(vector) or 1)
+        scores = self.matrix @ vector
+        best = np.argsort(-scores)[:k]
+        return [self.chunks[i] for i in best]
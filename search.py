@@ -1,9 +1,12 @@
 import streamlit as st
-import os
-import tempfile
 from docx import Document
-from PyPDF2 import PdfReader
 import openai
+import llm
+import extraction
+import documents
+import retrieval
+import artifacts
+import ui
 from io import BytesIO
 
 # Set your API key from Streamlit secrets
@@ -16,59 +19,55 @@ st.title("Semantic Document Search")
 # File uploader
 uploaded_files = st.file_uploader("Upload PDF or Word documents", type=["pdf", "docx"], accept_multiple_files=True)
 
-documents = []
+ui.sidebar_panels()
 
-# Text extraction
-def extract_text_from_pdf(file):
-    reader = PdfReader(file)
-    return "\n".join(page.extract_text() or "" for page in reader.pages)
+uploaded_documents = []
 
-def extract_text_from_docx(file):
-    doc = Document(file)
-    return "\n".join(para.text for para in doc.paragraphs)
-
-# Process uploaded files
+# Process uploaded files; opening only spools each upload and counts its pages
 if uploaded_files:
-    for file in uploaded_files:
-        if file.name.endswith(".pdf"):
-            text = extract_text_from_pdf(file)
-        elif file.name.endswith(".docx"):
-            text = extract_text_from_docx(file)
-        else:
-            continue
-        documents.append({"filename": file.name, "content": text})
-    st.success(f"Loaded {len(documents)} documents.")
+    supported = [file for file in uploaded_files if extraction.file_kind(file.name) is not None]
+    uploaded_documents = [documents.open_document(file.name, file.getbuffer()) for file in supported]
+    st.success(f"Loaded {len(uploaded_documents)} documents ({sum(len(doc) for doc in uploaded_documents)} pages).")
+    with st.sidebar.expander("Document cache"):
+        st.json(extraction.document_cache.stats())
+    use_embeddings = st.sidebar.checkbox("Semantic ranking (embeddings)", value=False)
 
 # Text input
 user_query = st.text_input("What would you like to extract or search for?")
 
-if user_query and documents:
-    full_text = "\n\n".join(doc["content"] for doc in documents)
+if user_query and uploaded_documents:
+    # Pages are extracted and indexed on the first query; the index is shared by every session
+    # with the same uploads instead of sending the whole corpus with every query
+    progress = st.progress(0.0, text="Extracting content...")
+    documents.prefetch(
+        uploaded_documents,
+        progress=lambda done, total: progress.progress(done / total, text=f"Extracted {done}/{total} page blocks"),
+    )
+    progress.empty()
 
-    with st.spinner("Querying documents..."):
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant who extracts relevant content from documents."},
-                    {"role": "user", "content": f"Search the following document content and respond to this prompt:\n\n{user_query}\n\nDOCUMENTS:\n{full_text}"}
-                ]
-            )
-            result = response.choices[0].message.content
-        except Exception as e:
-            st.error(f"OpenAI API error: {e}")
-            result = ""
+    st.subheader("Search Result")
+    # Semantic ranking calls the embeddings API, so indexing and search fail like the answer does
+    try:
+        with st.spinner("Indexing documents..."):
+            index_cls = retrieval.EmbeddingIndex if use_embeddings else retrieval.BM25Index
+            search_index = documents.index_for(uploaded_documents, index_cls)
+        excerpts = retrieval.format_chunks(search_index.search(user_query, k=retrieval.TOP_K))
+        result = st.write_stream(llm.chat_stream(
+            "You are a helpful assistant who extracts relevant content from documents. Cite the [filename, p. N] of each excerpt you use.",
+            f"Search the following document excerpts and respond to this prompt:\n\n{user_query}\n\nEXCERPTS:\n{excerpts}",
+        ))
+    except Exception as e:
+        st.error(f"OpenAI API error: {e}")
+        result = ""
 
     if result:
-        st.subheader("Search Result")
-        st.markdown(result)
-
-        # Save to Word
-        output_path = os.path.join(tempfile.gettempdir(), "search_result.docx")
+        # Build the Word document in memory
         doc = Document()
         for line in result.split("\n"):
             doc.add_paragraph(line.strip())
-        doc.save(output_path)
+        output = BytesIO()
+        doc.save(output)
+
+        st.download_button("Download as Word Document", output.getvalue(), file_name="search_result.docx", mime=artifacts.DOCX_MIME)
 
-        with open(output_path, "rb") as f:
-            st.download_button("Download as Word Document", f, file_name="search_result.docx")
\ No newline at end of file
+ui.timings_panel()
@@ -0,0 +1,43 @@
+import json
+from cache_store import SQLiteCache, cache_key
+
+# Bump when prompts change enough that stored material should no longer be reused
+STORE_VERSION = 1
+
+
+# Hash of a section's source content (whitespace-normalized) and class type
+def section_hash(content, run_type):
+    return cache_key("section", STORE_VERSION, run_type, " ".join(content.split()))
+
+
+# Generated outline/narration/tips keyed by section_hash(), with no expiry, so re-processing
+# a revised document only regenerates sections whose content actually changed
+class SectionStore:
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 * 1024 * 1024):
+        self._cache = SQLiteCache("sections", max_bytes=max_bytes, cache_dir=cache_dir)
+
+    def get(self, content_hash):
+        record = self._cache.get(content_hash)
+        return json.loads(record) if record is not None else None
+
+    def has(self, content_hash):
+        return self._cache.has(content_hash)
+
+    def put(self, content_hash, heading, outline, narration, tips):
+        record = {"heading": heading, "outline": outline, "narration": narration, "tips": tips}
+        self._cache.set(content_hash, json.dumps(record))
+        return record
+
+    def stats(self):
+        return self._cache.stats()
+
+
+_default_store = None
+
+
+# Process-wide store used by the Streamlit apps
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = SectionStore()
+    return _default_store
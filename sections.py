@@ -0,0 +1,112 @@
+import io
+import zipfile
+from docx import Document
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+# Extract sections from Markdown-style headings in .docx (### style).
+# doc_path may be a path or a file-like object; returns a list of (heading, content).
+# Loads the whole document through python-docx and skips tables. iter_sections() streams
+# instead, and also starts sections at Heading-styled paragraphs and keeps table text.
+def extract_sections_markdown_headings(doc_path):
+    doc = Document(doc_path)
+    text_blocks = [p.text.strip() for p in doc.paragraphs if p.text.strip() != ""]
+    sections = []
+    current_heading = None
+    current_content = []
+
+    for line in text_blocks:
+        if line.startswith("### "):
+            if current_heading and current_content:
+                sections.append((current_heading, "\n".join(current_content).strip()))
+            current_heading = line.replace("### ", "").strip()
+            current_content = []
+        elif current_heading:
+            current_content.append(line)
+
+    if current_heading and current_content:
+        sections.append((current_heading, "\n".join(current_content).strip()))
+
+    return sections
+
+
+# Style ids of the document's "Heading N" paragraph styles
+def _heading_style_ids(docx_zip):
+    try:
+        styles_xml = docx_zip.read("word/styles.xml")
+    except KeyError:
+        return set()
+    ids = set()
+    for style in etree.fromstring(styles_xml).iter(f"{W}style"):
+        name = style.find(f"{W}name")
+        if name is not None and name.get(f"{W}val", "").lower().startswith("heading"):
+            ids.add(style.get(f"{W}styleId"))
+    return ids
+
+
+def _paragraph_text(paragraph):
+    parts = []
+    for el in paragraph.iter(f"{W}t", f"{W}tab", f"{W}br", f"{W}cr"):
+        if el.tag == f"{W}t":
+            parts.append(el.text or "")
+        elif el.tag == f"{W}tab":
+            parts.append("\t")
+        else:
+            parts.append("\n")
+    return "".join(parts)
+
+
+# Lazily yield (heading, content) sections straight from word/document.xml.
+# source is the .docx as bytes, a path or a binary file object. Both "### " paragraphs and
+# paragraphs in Word Heading styles start a section; paragraphs inside tables are content of
+# the current section and never start one. Parsed elements are freed as soon as they are
+# read, so memory stays flat regardless of document size.
+def iter_sections(source, heading_styles=True):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as docx_zip:
+        heading_ids = _heading_style_ids(docx_zip) if heading_styles else set()
+        current_heading = None
+        current_content = []
+        # Tables being parsed; cell paragraphs end before their table does
+        table_depth = 0
+
+        with docx_zip.open("word/document.xml") as xml:
+            for event, el in etree.iterparse(xml, events=("start", "end"), tag=(f"{W}p", f"{W}tbl")):
+                if el.tag == f"{W}tbl":
+                    if event == "start":
+                        table_depth += 1
+                    else:
+                        table_depth -= 1
+                        _release(el)
+                    continue
+                if event == "start":
+                    continue
+
+                line = _paragraph_text(el).strip()
+                style = el.find(f"{W}pPr/{W}pStyle")
+                style_id = style.get(f"{W}val") if style is not None else None
+                _release(el)
+                if not line:
+                    continue
+
+                if not table_depth and (line.startswith("### ") or style_id in heading_ids):
+                    if current_heading and current_content:
+                        yield current_heading, "\n".join(current_content).strip()
+                    current_heading = line[4:].strip() if line.startswith("### ") else line
+                    current_content = []
+                elif current_heading:
+                    current_content.append(line)
+
+        if current_heading and current_content:
+            yield current_heading, "\n".join(current_content).strip()
+
+
+def _release(el):
+    el.clear()
+    parent = el.getparent()
+    if parent is not None:
+        while el.getprevious() is not None:
+            del parent[0]
@@ -0,0 +1,131 @@
+from itertools import islice
+import budget
+import llm
+import retrieval
+
+TOPIC_SYSTEM = "You are a document analyst. Extract a list of specific, self-contained topics based on the query. Format as a numbered or bullet list."
+EXTRACT_SYSTEM = "You extract training content from documents."
+NO_CONTENT = "NONE"
+# A merged topic list longer than this gets one extra LLM pass to combine near-duplicates
+MAX_TOPICS = 25
+
+
+def topic_prompt(text, query):
+    return f"""From this content:
+
+{text}
+
+What topics are relevant to this query: {query}
+"""
+
+
+def topic_extraction_prompt(topic, excerpts):
+    return f"""Extract detailed content for this topic:
+
+{topic}
+
+From the following document excerpts:
+
+{excerpts}
+
+If the excerpts have nothing on this topic, reply only with {NO_CONTENT}.
+"""
+
+
+def parse_topic_lines(topics):
+    return [line.strip("•*-1234567890. ") for line in topics.strip().splitlines() if line.strip("•*-1234567890. ")]
+
+
+def _dedupe(lines):
+    seen, unique = set(), []
+    for line in lines:
+        key = " ".join(line.lower().split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(line)
+    return unique
+
+
+def _map(prompts, system):
+    tasks = {f"chunk {i + 1}": (system, prompt) for i, prompt in enumerate(prompts)}
+    results, errors = llm.run_generations(tasks)
+    if not results and errors:
+        raise next(iter(errors.values()))
+    return [results[name] for name in tasks if name in results]
+
+
+def _merge_topics(answers, query):
+    topics = _dedupe(line for answer in answers for line in parse_topic_lines(answer))
+    if len(topics) <= MAX_TOPICS:
+        return topics
+
+    merged = llm.chat(
+        TOPIC_SYSTEM,
+        f"These candidate topics were extracted from different parts of a large document set.\n"
+        f"Merge duplicates and overlapping items and keep the {MAX_TOPICS} most relevant to this query: {query}\n\n"
+        + "\n".join(f"- {topic}" for topic in topics),
+    )
+    return parse_topic_lines(merged)
+
+
+# Corpus pieces of at most MAP_CHUNK_TOKENS, cut at page boundaries using each document's
+# page-offset index and read only when the piece is needed
+def _document_pieces(documents):
+    max_chars = budget.MAP_CHUNK_TOKENS * budget.CHARS_PER_TOKEN
+    for document in documents:
+        for start, stop in document.page_ranges(max_chars):
+            text = document.text(start, stop)
+            if budget.fits(text, budget.MAP_CHUNK_TOKENS):
+                yield text
+            else:
+                yield from budget.split_to_budget(text)
+
+
+# Topics relevant to query in these documents.Document objects. A corpus within the token
+# budget is sent in one request; larger corpora are split at page boundaries, topics are
+# extracted from the pieces a few at a time (so memory stays bounded by the pieces in flight
+# rather than the corpus size), then deduplicated and, if still long, merged by one small
+# reduce call.
+def find_topics_in_documents(documents, query):
+    estimated = sum(document.char_count for document in documents) // budget.CHARS_PER_TOKEN
+    if estimated <= budget.MAX_PROMPT_TOKENS:
+        text = "  ".join(document.text() for document in documents)
+        if budget.fits(topic_prompt(text, query)):
+            return parse_topic_lines(llm.chat(TOPIC_SYSTEM, topic_prompt(text, query)))
+
+    pieces = _document_pieces(documents)
+    answers = []
+    while True:
+        window = list(islice(pieces, llm.MAX_WORKERS))
+        if not window:
+            break
+        answers.extend(_map([topic_prompt(piece, query) for piece in window], TOPIC_SYSTEM))
+    return _merge_topics(answers, query)
+
+
+# Detailed content for each selected topic using only the passages a retrieval index returns
+# for it. One request per topic over its top-k chunks (kept in document order), all topics in
+# parallel, so cost and latency follow the number of topics, not the corpus size.
+# Returns {topic: content} without the topics the documents have nothing on.
+def extract_topic_answers(selected, index, k=retrieval.TOP_K):
+    order = {id(chunk): i for i, chunk in enumerate(index.chunks)}
+    tasks = {}
+    for topic in selected:
+        chunks = sorted(index.search(topic, k=k), key=lambda chunk: order[id(chunk)])
+        tasks[topic] = (EXTRACT_SYSTEM, topic_extraction_prompt(topic, retrieval.format_chunks(chunks)))
+
+    results, errors = llm.run_generations(tasks)
+    if not results and errors:
+        raise next(iter(errors.values()))
+    answers = {}
+    for topic in selected:
+        answer = results.get(topic, "").strip()
+        if answer and answer != NO_CONTENT:
+            answers[topic] = answer
+    return answers
+
+
+# extract_topic_answers() as one text with a ### heading per topic
+def extract_topics_from_index(selected, index, k=retrieval.TOP_K):
+    answers = extract_topic_answers(selected, index, k)
+    return "\n\n".join(f"### {topic}\n{answer}" for topic, answer in answers.items())
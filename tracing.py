@@ -0,0 +1,99 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Most recent spans kept in memory for the sidebar panel and JSON-lines export
+MAX_SPANS = 5000
+# When set, every finished span is also appended to this file as one JSON line
+TRACE_LOG = os.getenv("TRACE_LOG")
+
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+
+
+# Time a block of work. Yields the span record so the block can attach what it learns
+# (token usage, bytes produced, cache hits); wall time and any exception type are added on exit.
+@contextlib.contextmanager
+def span(name, **attrs):
+    record = {"name": name, "start": round(time.time(), 3), **attrs}
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration_s"] = round(time.perf_counter() - start, 4)
+        record["thread"] = threading.current_thread().name
+        _finish(record)
+
+
+# Copy prompt/completion token counts from an OpenAI usage object onto a span
+def add_usage(record, usage):
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, field, None)
+        if value is not None:
+            record[field] = record.get(field, 0) + value
+    # Prompt tokens served from the provider's prompt cache (billed at a discount)
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if cached:
+        record["cached_tokens"] = record.get("cached_tokens", 0) + cached
+
+
+def _finish(record):
+    line = json.dumps(record, default=str)
+    with _lock:
+        _spans.append(record)
+        if TRACE_LOG:
+            with open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def spans():
+    with _lock:
+        return list(_spans)
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# Per span name: call count, wall time percentiles, summed tokens and bytes
+def summary():
+    grouped = {}
+    for record in spans():
+        grouped.setdefault(record["name"], []).append(record)
+
+    result = {}
+    for name, records in sorted(grouped.items()):
+        durations = sorted(r["duration_s"] for r in records)
+        entry = {
+            "count": len(records),
+            "total_s": round(sum(durations), 3),
+            "p50_s": round(_percentile(durations, 0.5), 3),
+            "p95_s": round(_percentile(durations, 0.95), 3),
+            "max_s": round(durations[-1], 3),
+        }
+        for field in ("prompt_tokens", "cached_tokens", "completion_tokens", "bytes"):
+            total = sum(r.get(field, 0) for r in records)
+            if total:
+                entry[field] = total
+        errors = sum(1 for r in records if "error" in r)
+        if errors:
+            entry["errors"] = errors
+        result[name] = entry
+    return result
+
+
+def export_jsonl():
+    return "".join(json.dumps(record, default=str) + "\n" for record in spans()).encode("utf-8")
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import openai_client
+import rate_limit
+import tracing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from cache_store import SQLiteCache, cache_key
+from llm import RETRYABLE_ERRORS
+
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+# The speech endpoint accepts up to 4096 characters per request
+MAX_SEGMENT_CHARS = 4000
+MAX_WORKERS = 4
+
+
+# Within a long paragraph, a segment also ends after any sentence whose hash hits this modulus.
+# Boundaries therefore depend only on nearby text, so editing one sentence changes one segment
+# and every other segment is still found in the cache.
+BOUNDARY_MODULUS = 6
+
+# Synthesized MP3 segments keyed by (model, voice, normalized text), least recently used evicted first
+segment_cache = SQLiteCache("tts_segments", max_bytes=2 * 1024 * 1024 * 1024)
+
+
+def normalize(text):
+    return " ".join(text.split())
+
+
+def _sentences(text):
+    for paragraph in re.split(r"\n\s*\n", text):
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", paragraph) if s.strip()]
+        for i, sentence in enumerate(sentences):
+            yield sentence, i == len(sentences) - 1
+
+
+def _is_boundary(sentence):
+    digest = hashlib.sha1(normalize(sentence).lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % BOUNDARY_MODULUS == 0
+
+
+# Split a narration script at sentence boundaries into segments of at most max_chars.
+# Segments end at paragraph breaks and content-defined sentence boundaries; a single
+# sentence longer than the limit is split between words.
+def split_script(text, max_chars=MAX_SEGMENT_CHARS):
+    segments = []
+    current = ""
+    for sentence, ends_paragraph in _sentences(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+        if ends_paragraph or _is_boundary(sentence):
+            segments.append(current)
+            current = ""
+    if current:
+        segments.append(current)
+    return segments
+
+
+def segment_key(text, model=TTS_MODEL, voice=TTS_VOICE):
+    return cache_key("tts", model, voice, normalize(text))
+
+
+# Synthesize one segment, streaming the MP3 straight to disk
+@retry(
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    wait=wait_random_exponential(min=1, max=20),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+def synthesize_segment(text, path, model=TTS_MODEL, voice=TTS_VOICE, priority=rate_limit.INTERACTIVE):
+    with tracing.span("audio.speech.create", model=model, chars=len(text)) as record:
+        record["queue_wait_s"] = round(rate_limit.speech_limiter.acquire(priority=priority), 4)
+        with openai_client.get_client().audio.speech.with_streaming_response.create(model=model, voice=voice, input=text) as response:
+            response.stream_to_file(path)
+        record["bytes"] = os.path.getsize(path)
+    return path
+
+
+# Cached audio for a segment if available, otherwise synthesize and cache it
+def render_segment(text, path, model=TTS_MODEL, voice=TTS_VOICE):
+    key = segment_key(text, model, voice)
+    cached = segment_cache.get(key)
+    if cached is not None:
+        with open(path, "wb") as f:
+            f.write(cached)
+        return path
+
+    synthesize_segment(text, path, model, voice)
+    with open(path, "rb") as f:
+        segment_cache.set(key, f.read())
+    return path
+
+
+# Synthesize a whole script into one MP3 written to output (a path or binary file object). Only segments missing from the cache
+# call the API; they run concurrently with bounded parallelism and everything is concatenated
+# in order (MP3 frames can be appended directly). progress(done, total) is called on the
+# calling thread as segments finish.
+def synthesize_script(text, output, model=TTS_MODEL, voice=TTS_VOICE, max_workers=MAX_WORKERS, progress=None):
+    segments = split_script(text)
+    if not segments:
+        raise ValueError("Nothing to synthesize: the script is empty.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = [os.path.join(tmp_dir, f"segment_{i:04d}.mp3") for i in range(len(segments))]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(segments))) as pool:
+            futures = [
+                pool.submit(render_segment, segment, path, model, voice)
+                for segment, path in zip(segments, paths)
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                if progress:
+                    progress(done, len(segments))
+
+        if hasattr(output, "write"):
+            _concatenate(paths, output)
+        else:
+            with open(output, "wb") as out:
+                _concatenate(paths, out)
+
+    return output
+
+
+def _concatenate(paths, out):
+    for path in paths:
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, out)
@@ -0,0 +1,66 @@
+# Streamlit pieces shared by the apps: the sidebar status panels and the background job poller
+import streamlit as st
+import jobs
+import llm
+import rate_limit
+import tracing
+
+CLASS_ARTIFACTS = ["Outline", "Narration", "Email Tips"]
+
+
+# OpenAI queue and response cache panels, plus the job queue's panel when the app has one
+def sidebar_panels(job_queue=None):
+    with st.sidebar.expander("OpenAI queue"):
+        st.json(rate_limit.stats())
+    with st.sidebar.expander("Response cache"):
+        st.json(llm.response_cache.stats())
+    if job_queue is not None:
+        with st.sidebar.expander("Background jobs"):
+            st.json(job_queue.stats())
+
+
+# Call last in the script so it includes the spans of this run
+def timings_panel():
+    if st.sidebar.checkbox("Show timings"):
+        with st.sidebar.expander("Timings", expanded=True):
+            st.json(tracing.summary())
+            st.download_button("Export spans (JSON lines)", tracing.export_jsonl(), file_name="spans.jsonl", mime="application/x-ndjson")
+
+
+# Outline, narration and email tips of a class job as they stream in (see course.class_job)
+def class_partial_tabs(partial):
+    texts = partial.get("texts", {})
+    for tab, name in zip(st.tabs(CLASS_ARTIFACTS), CLASS_ARTIFACTS):
+        tab.markdown(texts.get(name, ""))
+
+
+# Polls the job once a second without rerunning the whole page; a full rerun renders the result
+@st.fragment(run_every=1)
+def _job_progress(job_queue, job_id, render_partial):
+    job = job_queue.status(job_id)
+    if job is None or job["status"] in (jobs.DONE, jobs.FAILED):
+        st.rerun()
+    if job["status"] == jobs.QUEUED:
+        st.info(f"Waiting for a worker ({job['queue_position']} jobs ahead)...")
+        return
+    st.progress(job["progress"] or 0.0, text=job["message"])
+    if render_partial:
+        render_partial(job["result"] or {})
+
+
+# Status of the job whose id is in the URL. Apps run generation as background jobs and put the
+# job id in the URL (st.query_params["job"]) so reruns and page reloads pick the job up again
+# instead of restarting it. render_done(job_id, result) shows a finished job; render_partial(result)
+# shows the partial result of a running one. name is used in messages ("generation").
+def job_status(job_queue, render_done, render_partial=None, name="generation"):
+    job_id = st.query_params.get("job")
+    job = job_queue.status(job_id) if job_id else None
+    if job_id and job is None:
+        st.warning(f"That {name} job is no longer available.")
+        del st.query_params["job"]
+    if job and job["status"] in (jobs.QUEUED, jobs.RUNNING):
+        _job_progress(job_queue, job_id, render_partial)
+    elif job and job["status"] == jobs.FAILED:
+        st.error(f"{name[:1].upper() + name[1:]} failed: {job['error']}")
+    elif job and job["status"] == jobs.DONE:
+        render_done(job_id, job["result"])